@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from db_access import AsyncDatabase
+
+# Collection holding persisted deterioration relevance verdicts
+RELEVANCE_CACHE_COLLECTION = "relevance_cache"
+
+# Collection holding a version counter per reference collection, bumped on every reload
+CATALOG_VERSIONS_COLLECTION = "catalog_versions"
+
+# Cache sizing and expiry
+RELEVANCE_CACHE_MAX_ENTRIES = int(os.getenv("RELEVANCE_CACHE_MAX_ENTRIES", "1024"))
+RELEVANCE_CACHE_TTL_SECONDS = int(os.getenv("RELEVANCE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+FAILURE_SCENARIO_CACHE_MAX_ENTRIES = int(os.getenv("FAILURE_SCENARIO_CACHE_MAX_ENTRIES", "512"))
+
+# How long a collection version read from MongoDB is trusted before re-reading it
+CATALOG_VERSION_TTL_SECONDS = float(os.getenv("CATALOG_VERSION_TTL_SECONDS", "10"))
+
+def fingerprint(*parts: Any) -> str:
+    """
+    Stable hash of JSON-serialisable values, independent of dict key order.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class LRUCache:
+    """
+    Bounded in-process cache with least-recently-used eviction, optional
+    per-entry expiry, and hit/miss counters.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires is None or expires > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        self.entries[key] = (value, expires)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+class AnalysisCache:
+    """
+    Two-tier cache for LLM analysis results: an in-process LRU in front of a
+    MongoDB collection whose TTL index expires old verdicts.
+    """
+
+    def __init__(self, database: AsyncDatabase, collection: str = RELEVANCE_CACHE_COLLECTION,
+                 max_entries: int = RELEVANCE_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = RELEVANCE_CACHE_TTL_SECONDS):
+        self.database = database
+        self.collection = database.db[collection]
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(max_entries, ttl_seconds)
+        self.persistent_hits = 0
+
+    async def ensure_indexes(self):
+        await self.database.run(self.collection.create_index, "key", unique=True)
+        await self.database.run(self.collection.create_index, "createdAt", expireAfterSeconds=self.ttl_seconds)
+
+    async def get(self, key: str):
+        """
+        Return the cached value for key from memory or MongoDB, or None.
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        try:
+            doc = await self.database.run(self.collection.find_one, {"key": key}, {"_id": 0, "value": 1})
+        except Exception as e:
+            # A cache outage should only cost a recomputation
+            print(f"Error reading analysis cache: {str(e)}")
+            return None
+        if doc is None:
+            return None
+        self.persistent_hits += 1
+        self.memory.set(key, doc["value"])
+        return doc["value"]
+
+    async def set(self, key: str, value):
+        """
+        Store value under key in both tiers.
+        """
+        self.memory.set(key, value)
+        try:
+            await self.database.run(
+                self.collection.update_one,
+                {"key": key},
+                {"$set": {"key": key, "value": value, "createdAt": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error writing analysis cache: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.memory.stats(), "persistent_hits": self.persistent_hits}
+
+def bump_catalog_version(db, name: str):
+    """
+    Increment the version counter of a reference collection after reloading it.
+
+    Args:
+        db: Synchronous pymongo database
+        name: Name of the reloaded collection
+    """
+    db[CATALOG_VERSIONS_COLLECTION].update_one(
+        {"name": name},
+        {"$inc": {"version": 1}, "$set": {"updatedAt": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+class CatalogVersions:
+    """
+    Reads collection version counters, trusting each value for a short TTL so
+    cache lookups do not add a database round trip per request.
+    """
+
+    def __init__(self, database: AsyncDatabase, ttl_seconds: float = CATALOG_VERSION_TTL_SECONDS):
+        self.database = database
+        self.collection = database.db[CATALOG_VERSIONS_COLLECTION]
+        self.versions = LRUCache(1024, ttl_seconds)
+
+    async def get_many(self, names) -> Dict[str, int]:
+        """
+        Return {collection name: version}, with 0 for collections never versioned.
+        """
+        versions = {name: self.versions.get(name) for name in names}
+        missing = [name for name, version in versions.items() if version is None]
+        if missing:
+            docs = await self.database.run(
+                lambda: list(self.collection.find({"name": {"$in": missing}}, {"_id": 0}))
+            )
+            found = {doc["name"]: doc.get("version", 0) for doc in docs}
+            for name in missing:
+                versions[name] = found.get(name, 0)
+                self.versions.set(name, versions[name])
+        return versions
@@ -0,0 +1,352 @@
+import argparse
+import html
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from deterioration_normalizer import get_normalizer, normalize_key
+from dxl_model import parse_dxl_document
+from field_extraction import document_key, find_dxl_files, iter_dxl_documents
+from precedent_index import is_empty
+
+# Directory holding the matrix as memory-mappable .npy arrays plus metadata.json
+CREDIBILITY_MATRIX_PATH = os.getenv("CREDIBILITY_MATRIX_PATH", "credibility_matrix")
+
+# Item families of the per-mechanism, per-location grid
+GRID_TEXT_FAMILIES = ("Field_Tx_1", "Deterioration_Tx", "Location_Tx", "DetCredible_Tx", "DetComment_Tx")
+GRID_NUMBER_FAMILIES = ("LocCount_Nb", "CUIScore_Nb")
+
+# Field_Tx_1 items holding the equipment type, by form, in the order they are
+# tried; forms not listed here use the default
+EQUIPMENT_TYPE_ITEMS = {"fProjectItem": ("Field_Tx_1_7",)}
+DEFAULT_EQUIPMENT_TYPE_ITEMS = ("Field_Tx_1_7", "Field_Tx_1_8")
+
+# Answers and placeholders that turn up in the equipment type item of records
+# laid out differently, e.g. relief valves; they are not equipment types
+EQUIPMENT_TYPE_IGNORED = {"", "-", "n a", "none", "unknown", "yes", "no", "true", "false"}
+
+# Broader equipment category of normalized equipment types, following the
+# equipment catalog categories, so a query for 'vessel' finds drums and columns
+EQUIPMENT_TYPE_CATEGORIES = {
+    "drum pot": "pressure vessel",
+    "column": "pressure vessel",
+    "reactor": "pressure vessel",
+    "heat exchanger": "heat exchanger",
+    "plant pipework": "piping",
+    "underground pipework": "piping",
+    "pump": "pump",
+}
+
+# Cell credibility codes; cells without a Yes/No answer are unknown
+CREDIBLE_NO, CREDIBLE_YES, CREDIBLE_UNKNOWN = 0, 1, -1
+
+# Location key for cells that name no location
+UNSPECIFIED_LOCATION = "unspecified"
+
+# Arrays saved for the matrix, by name
+MATRIX_ARRAYS = ("doc", "mechanism", "location", "credible", "commented", "doc_ptr",
+                 "mechanism_order", "mechanism_ptr", "doc_equipment", "cui_scores")
+
+def grid_index(name: str) -> tuple:
+    """
+    Integer indices after the family of an item name, e.g. 'Location_Tx_3_2' -> (3, 2).
+    """
+    parts = name.split("_")[2:]
+    return tuple(int(p) for p in parts)
+
+def normalize_equipment_type(value: str) -> str:
+    """
+    Singular, case- and punctuation-insensitive form of an equipment type, e.g.
+    'Drums - Pots' -> 'drum pot', or '' if the value is not an equipment type.
+    """
+    key = normalize_key(html.unescape(value))
+    if key in EQUIPMENT_TYPE_IGNORED:
+        return ""
+    return " ".join(token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+                    for token in key.split())
+
+def document_equipment_type(document, items: Dict[str, str]) -> str:
+    """
+    Normalized equipment type of an assessment from the first Field_Tx_1 item its form holds one in.
+    """
+    for name in EQUIPMENT_TYPE_ITEMS.get(document.form, DEFAULT_EQUIPMENT_TYPE_ITEMS):
+        equipment = normalize_equipment_type(items.get(name, ""))
+        if equipment:
+            return equipment
+    return ""
+
+def family_items(values: Iterable[tuple], families: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Group (item name, value) pairs named '<family>_<index>' by family, e.g. 'LocCount_Nb_3' under 'LocCount_Nb'.
+    """
+    results = {family: {} for family in families}
+    for name, value in values:
+        for family in results:
+            if name.startswith(family + "_") and name[len(family) + 1:].replace("_", "").isdigit():
+                results[family][name] = value
+                break
+    return results
+
+def document_grid(items: Dict[str, Dict[str, str]], numbers: Dict[str, Dict[str, float]]) -> List[Dict[str, Any]]:
+    """
+    Cells of one assessment's deterioration x location grid.
+
+    A cell exists where Location_Tx_<det>_<loc>, DetCredible_Tx_<det>_<loc> or
+    DetComment_Tx_<det>_<loc> has a value. Cells past LocCount_Nb_<det> are left
+    over from earlier edits and are skipped.
+
+    Returns:
+        Dictionaries with 'mechanism' (name), 'location', 'credible' and 'commented'
+    """
+    names = items.get("Deterioration_Tx", {})
+    counts = numbers.get("LocCount_Nb", {})
+    cells = {}
+    for family in ("Location_Tx", "DetCredible_Tx", "DetComment_Tx"):
+        for name, value in items.get(family, {}).items():
+            index = grid_index(name)
+            if len(index) != 2 or is_empty(value):
+                continue
+            det, loc = index
+            count = counts.get(f"LocCount_Nb_{det}")
+            mechanism = names.get(f"Deterioration_Tx_{det}")
+            if (count is not None and loc > count) or is_empty(mechanism):
+                continue
+            cell = cells.setdefault(index, {"mechanism": mechanism, "location": UNSPECIFIED_LOCATION,
+                                            "credible": CREDIBLE_UNKNOWN, "commented": False})
+            if family == "Location_Tx":
+                cell["location"] = normalize_key(html.unescape(value)) or UNSPECIFIED_LOCATION
+            elif family == "DetCredible_Tx":
+                answer = value.strip().lower()
+                if answer in ("yes", "no"):
+                    cell["credible"] = CREDIBLE_YES if answer == "yes" else CREDIBLE_NO
+            else:
+                cell["commented"] = True
+    return [cells[index] for index in sorted(cells)]
+
+def document_cui_scores(numbers: Dict[str, Dict[str, float]]) -> Dict[int, float]:
+    """
+    CUI factor scores of one assessment, by factor number (CUIScore_Nb_<factor>).
+    Factors are numbered from 1; anything else is not a score column and is skipped.
+    """
+    scores = {}
+    for name, value in numbers.get("CUIScore_Nb", {}).items():
+        index = grid_index(name)
+        if len(index) == 1 and index[0] >= 1:
+            scores[index[0]] = value
+    return scores
+
+def iter_grid_records(folder_path: str):
+    """
+    Yield the key, equipment type, grid cells and CUI scores of every assessment under a folder.
+    """
+    for file_path in find_dxl_files(folder_path):
+        try:
+            documents = list(iter_dxl_documents(file_path))
+        except Exception as e:
+            print(f"Error processing {file_path.name}: {str(e)}")
+            continue
+        for content in documents:
+            document = parse_dxl_document(content)
+            items = family_items(document.texts.items(), GRID_TEXT_FAMILIES)
+            # Unparseable numbers are NaN in the document model; they carry no count or score
+            numbers = family_items(
+                ((name, value) for name, value in zip(document.number_names, document.number_values)
+                 if not math.isnan(value)),
+                GRID_NUMBER_FAMILIES
+            )
+            yield {
+                "key": document_key(file_path, {"unid": document.unid}, len(documents)),
+                "equipment": document_equipment_type(document, items["Field_Tx_1"]),
+                "cells": document_grid(items, numbers),
+                "cui_scores": document_cui_scores(numbers)
+            }
+
+class CredibilityMatrix:
+    """
+    Sparse deterioration x location credibility matrix over a corpus of assessments.
+
+    Cells are COO arrays (doc, mechanism, location, credible, commented) sorted
+    by document, so doc_ptr slices out one document's cells (CSR by document);
+    mechanism_order and mechanism_ptr index the same cells by mechanism. A
+    mechanism is its deterioration catalog ID, or its normalized name when the
+    name does not resolve; a name resolving to several IDs repeats its cells
+    under each. Saved arrays are loaded memory-mapped.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], metadata: Dict[str, List[str]]):
+        for name in MATRIX_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.documents = metadata["documents"]
+        self.mechanisms = metadata["mechanisms"]
+        self.locations = metadata["locations"]
+        self.equipment_types = metadata["equipment_types"]
+        self.document_index = {key: i for i, key in enumerate(self.documents)}
+        self.mechanism_index = {m: i for i, m in enumerate(self.mechanisms)}
+
+    @classmethod
+    def build(cls, records: Iterable[Dict[str, Any]]) -> "CredibilityMatrix":
+        normalizer = get_normalizer()
+        vocabularies = {"mechanisms": {}, "locations": {}, "equipment_types": {}}
+        columns = {"doc": [], "mechanism": [], "location": [], "credible": [], "commented": []}
+        documents, doc_equipment, cui_scores = [], [], []
+
+        def index(vocabulary: str, value: str) -> int:
+            return vocabularies[vocabulary].setdefault(value, len(vocabularies[vocabulary]))
+
+        for record in records:
+            doc = len(documents)
+            documents.append(record["key"])
+            equipment = normalize_equipment_type(record["equipment"])
+            doc_equipment.append(index("equipment_types", equipment) if equipment else -1)
+            cui_scores.append(record["cui_scores"])
+            names = list({cell["mechanism"] for cell in record["cells"]})
+            resolutions = dict(zip(names, normalizer.resolve_many(names)))
+            for cell in record["cells"]:
+                resolution = resolutions[cell["mechanism"]]
+                if resolution.method == "ignored":
+                    continue
+                for mechanism in resolution.ids or (normalize_key(cell["mechanism"]),):
+                    columns["doc"].append(doc)
+                    columns["mechanism"].append(index("mechanisms", mechanism))
+                    columns["location"].append(index("locations", cell["location"]))
+                    columns["credible"].append(cell["credible"])
+                    columns["commented"].append(cell["commented"])
+
+        doc = np.array(columns["doc"], dtype=np.int32)
+        mechanism = np.array(columns["mechanism"], dtype=np.int32)
+        location = np.array(columns["location"], dtype=np.int32)
+        order = np.lexsort((location, mechanism, doc))
+        arrays = {
+            "doc": doc[order],
+            "mechanism": mechanism[order],
+            "location": location[order],
+            "credible": np.array(columns["credible"], dtype=np.int8)[order],
+            "commented": np.array(columns["commented"], dtype=np.bool_)[order],
+            "doc_equipment": np.array(doc_equipment, dtype=np.int32)
+        }
+        arrays["doc_ptr"] = np.zeros(len(documents) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(arrays["doc"], minlength=len(documents)), out=arrays["doc_ptr"][1:])
+        arrays["mechanism_order"] = np.argsort(arrays["mechanism"], kind="stable")
+        arrays["mechanism_ptr"] = np.zeros(len(vocabularies["mechanisms"]) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(arrays["mechanism"], minlength=len(vocabularies["mechanisms"])),
+                  out=arrays["mechanism_ptr"][1:])
+        factors = max((max(scores) for scores in cui_scores if scores), default=0)
+        arrays["cui_scores"] = np.full((len(documents), factors), np.nan, dtype=np.float32)
+        for row, scores in enumerate(cui_scores):
+            for factor, score in scores.items():
+                arrays["cui_scores"][row, factor - 1] = score
+
+        metadata = {"documents": documents, **{name: list(v) for name, v in vocabularies.items()}}
+        return cls(arrays, metadata)
+
+    def save(self, path: str = CREDIBILITY_MATRIX_PATH):
+        """
+        Write every array as .npy and the vocabularies as metadata.json, which is written last.
+        """
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in MATRIX_ARRAYS:
+            np.save(directory / f"{name}.npy", np.asarray(getattr(self, name)))
+        metadata = {"documents": self.documents, "mechanisms": self.mechanisms,
+                    "locations": self.locations, "equipment_types": self.equipment_types}
+        with open(directory / "metadata.json", "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+
+    @classmethod
+    def load(cls, path: str = CREDIBILITY_MATRIX_PATH) -> "CredibilityMatrix":
+        directory = Path(path)
+        with open(directory / "metadata.json", encoding="utf-8") as f:
+            metadata = json.load(f)
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in MATRIX_ARRAYS}
+        return cls(arrays, metadata)
+
+    def document_cells(self, key: str) -> Dict[str, np.ndarray]:
+        """
+        COO arrays (mechanism, location, credible, commented) of one document's grid.
+        """
+        doc = self.document_index[key]
+        start, end = self.doc_ptr[doc], self.doc_ptr[doc + 1]
+        return {name: getattr(self, name)[start:end] for name in ("mechanism", "location", "credible", "commented")}
+
+    def mechanism_cells(self, mechanism: str, equipment: Optional[str] = None) -> np.ndarray:
+        """
+        Cell indices of a mechanism, optionally only on equipment of a given type.
+
+        Args:
+            mechanism: Deterioration catalog ID, or a free-text name resolved like the extracted ones
+            equipment: Equipment type or category words, normalized like the extracted types,
+                e.g. 'drums' or 'vessel'
+        """
+        index = self.mechanism_index.get(mechanism)
+        if index is None:
+            resolution = get_normalizer().resolve(mechanism)
+            candidates = resolution.ids or (normalize_key(mechanism),)
+            index = next((self.mechanism_index[m] for m in candidates if m in self.mechanism_index), None)
+        if index is None:
+            return np.zeros(0, dtype=np.int64)
+        cells = self.mechanism_order[self.mechanism_ptr[index]:self.mechanism_ptr[index + 1]]
+        if equipment:
+            words = set(normalize_equipment_type(equipment).split())
+            types = [i for i, t in enumerate(self.equipment_types)
+                     if words and words <= set(f"{t} {EQUIPMENT_TYPE_CATEGORIES.get(t, '')}".split())]
+            cells = cells[np.isin(self.doc_equipment[self.doc[cells]], types)]
+        return cells
+
+    def location_counts(self, mechanism: str, equipment: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        How often each location was found credible for a mechanism.
+
+        Returns:
+            Dictionaries with 'location', 'credible' and 'assessed' (cells with a
+            Yes/No answer) counts and the credible 'share', most credible first
+        """
+        cells = self.mechanism_cells(mechanism, equipment)
+        locations, credible = self.location[cells], self.credible[cells]
+        yes = np.bincount(locations[credible == CREDIBLE_YES], minlength=len(self.locations))
+        assessed = np.bincount(locations[credible != CREDIBLE_UNKNOWN], minlength=len(self.locations))
+        ranked = np.lexsort((-assessed, -yes))
+        return [
+            {"location": self.locations[i], "credible": int(yes[i]), "assessed": int(assessed[i]),
+             "share": round(float(yes[i] / assessed[i]), 3)}
+            for i in ranked if assessed[i]
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "documents": len(self.documents),
+            "cells": len(self.doc),
+            "mechanisms": len(self.mechanisms),
+            "locations": len(self.locations),
+            "credible_cells": int(np.count_nonzero(np.asarray(self.credible) == CREDIBLE_YES))
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the deterioration x location credibility matrix")
+    parser.add_argument("folder", nargs="?", help="Folder containing DXL files to build from")
+    parser.add_argument("--output", default=CREDIBILITY_MATRIX_PATH, help="Matrix directory")
+    parser.add_argument("--mechanism", help="Report credible locations for this mechanism ID or name")
+    parser.add_argument("--equipment", help="Only count equipment of this type or category, e.g. 'vessel'")
+    parser.add_argument("--top", type=int, default=15, help="Locations to report")
+    args = parser.parse_args()
+
+    if args.folder:
+        started = time.perf_counter()
+        matrix = CredibilityMatrix.build(iter_grid_records(args.folder))
+        matrix.save(args.output)
+        stats = matrix.stats()
+        print(f"Credibility matrix: {stats['cells']} cells ({stats['credible_cells']} credible) over "
+              f"{stats['documents']} assessments, {stats['mechanisms']} mechanisms, {stats['locations']} locations "
+              f"in {time.perf_counter() - started:.1f}s -> {args.output}")
+
+    if args.mechanism:
+        matrix = CredibilityMatrix.load(args.output)
+        for row in matrix.location_counts(args.mechanism, args.equipment)[:args.top]:
+            print(f"{row['location']:40} {row['credible']:5} / {row['assessed']:<5} {row['share']:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from pymongo import MongoClient
+
+# Connection pool and timeout settings
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000"))
+
+def create_mongo_client(uri: str) -> MongoClient:
+    """
+    Create a MongoClient with explicit pool sizing and per-operation timeouts.
+    """
+    return MongoClient(
+        uri,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        timeoutMS=MONGO_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    )
+
+class AsyncDatabase:
+    """
+    Non-blocking access to a MongoDB database for async endpoints.
+
+    pymongo calls run on a thread pool sized to the connection pool, so a slow
+    query occupies one worker thread instead of the event loop, and no more
+    queries are in flight than there are connections to serve them.
+    """
+
+    def __init__(self, client: MongoClient, db_name: str, max_workers: int = MONGO_MAX_POOL_SIZE):
+        self.client = client
+        self.db = client[db_name]
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mongo")
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking pymongo call on the database thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def find(self, collection: str, query: Optional[Dict] = None,
+                   projection: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """
+        Return all documents matching query from a collection.
+        """
+        return await self.run(lambda: list(self.db[collection].find(query or {}, projection)))
+
+    async def find_one(self, collection: str, query: Dict,
+                       projection: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the first document matching query, or None.
+        """
+        return await self.run(self.db[collection].find_one, query, projection)
+
+    async def ping(self):
+        """
+        Verify the connection to the server.
+        """
+        return await self.run(self.client.admin.command, 'ping')
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from analysis_cache import LRUCache
+from field_extraction import find_dxl_files, iter_document_records
+from initial_data import DETERIORATION_DATA
+
+# Reviewed aliases ({value: [deterioration IDs]}, an empty list marks a value as
+# not a catalog mechanism), merged over the built-in table
+DETERIORATION_ALIASES_PATH = os.getenv("DETERIORATION_ALIASES_PATH", "deterioration_aliases.json")
+
+# Where the CLI writes values that need a reviewer
+REVIEW_QUEUE_PATH = "deterioration_review.json"
+
+# Built-in aliases for abbreviations and wordings the catalog names do not cover
+ALIASES = {
+    "corrosion": ["corr-general"],
+    "general": ["corr-general"],
+    "general corrosion": ["corr-general"],
+    "external corrosion": ["corr-general"],
+    "internal corrosion": ["corr-general"],
+    "environmental corrosion": ["corr-general"],
+    "pitting": ["corr-pitting"],
+    "erosion": ["erosion-particle"],
+    "erosion corrosion": ["erosion-particle"],
+    "fatigue": ["fatigue-mech"],
+    "vibration induced fatigue": ["fatigue-mech"],
+    "fatigue limited life pressure": ["fatigue-mech"],
+    "fatigue limited life temperature": ["fatigue-thermal"],
+    "corrosion fatigue": ["corr-general", "fatigue-mech"],
+    "scc": ["crack-scc"],
+    "chloride scc": ["crack-scc"],
+    "sulphide scc": ["crack-scc"],
+    "cui": ["corr-cui"],
+    "corrosion under fireproofing": ["corr-cui"],
+    "corrosion under fireproofing cuf": ["corr-cui"],
+    "corrosion under wrapping": ["corr-cui"],
+    "mic": ["corr-mic"],
+    "microbial corrosion": ["corr-mic"],
+    "fac": ["erosion-fac"],
+    "deadleg corrosion": ["corr-deadleg"],
+    "htha": ["htha"],
+    "hic": ["hydrogen-damage"],
+    "hydrogen blistering": ["hydrogen-damage"],
+    "brittle failure": ["brittle-fracture"],
+    "creep stress rupture": ["creep"],
+    "creep overheating": ["creep"],
+    "corrosion under lining or deposit": ["coating-lining"],
+    "polyethylene deterioration": ["nonmetallic-deterioration"],
+    "uv deterioration": ["nonmetallic-deterioration"],
+    "uv degradation": ["nonmetallic-deterioration"],
+    "gasket deterioration": ["nonmetallic-deterioration"],
+    "bladder deterioration": ["nonmetallic-deterioration"],
+}
+
+# Placeholder and catch-all values that name no mechanism
+IGNORED_VALUES = {"", "-", "n a", "none", "other", "spare", "hidden areas", "maintenance effectiveness"}
+
+# Minimum cosine similarity for a fuzzy match, and below which a match is
+# still queued for review
+FUZZY_MIN_SCORE = float(os.getenv("NORMALIZER_FUZZY_MIN_SCORE", "0.75"))
+REVIEW_BELOW_SCORE = float(os.getenv("NORMALIZER_REVIEW_BELOW_SCORE", "0.85"))
+
+# Query strings scored per matrix product
+FUZZY_BATCH_SIZE = 4096
+
+# Lowercase word tokens; separators between combined mechanisms, e.g. "Corrosion / Pitting"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+PART_SEPARATOR_PATTERN = re.compile(r"\s*(?:/|&|\+|,|;|\band\b)\s*", re.IGNORECASE)
+
+class Resolution(NamedTuple):
+    """
+    Outcome of normalizing one value.
+
+    method is "alias", "fuzzy", "ignored" or "unresolved"; score is the fuzzy
+    similarity (1.0 for exact aliases).
+    """
+    ids: Tuple[str, ...]
+    method: str
+    score: float
+
+UNRESOLVED = Resolution((), "unresolved", 0.0)
+IGNORED = Resolution((), "ignored", 1.0)
+
+# Built normalizers keyed by catalog and alias-file version
+normalizer_cache = LRUCache(4)
+
+def normalize_key(value: str) -> str:
+    """
+    Case- and punctuation-insensitive form of a value, e.g. 'Corrosion / pitting' -> 'corrosion pitting'.
+    """
+    return " ".join(TOKEN_PATTERN.findall(value.lower()))
+
+def text_features(key: str) -> List[str]:
+    """
+    Word tokens and padded character trigrams of a normalized key.
+    """
+    features = []
+    for token in key.split():
+        padded = f" {token} "
+        features.append(f"w:{token}")
+        features.extend(f"c:{padded[i:i+3]}" for i in range(len(padded) - 2))
+    return features
+
+def load_aliases(path: str = DETERIORATION_ALIASES_PATH) -> Dict[str, List[str]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+class DeteriorationNormalizer:
+    """
+    Resolves free-text deterioration names to catalog IDs.
+
+    Exact matches on normalized keys come from the alias table (catalog IDs and
+    names, built-in and reviewed aliases). Everything else is scored by cosine
+    similarity of word and trigram vectors against the alias keys, one matrix
+    product per batch of distinct values; combined values such as "Dead Leg
+    Corrosion / MIC" are also tried part by part. Every distinct value is
+    resolved once and memoized.
+    """
+
+    def __init__(self, catalog: List[Dict], aliases: Optional[Dict[str, List[str]]] = None):
+        catalog_ids = {item["id"] for item in catalog}
+        self.aliases: Dict[str, Tuple[str, ...]] = {}
+        for item in catalog:
+            self.aliases[normalize_key(item["id"])] = (item["id"],)
+            self.aliases[normalize_key(item["name"])] = (item["id"],)
+        for value, ids in ALIASES.items():
+            ids = tuple(id for id in ids if id in catalog_ids)
+            if ids:
+                self.aliases[normalize_key(value)] = ids
+        for value, ids in (aliases or {}).items():
+            # An empty list marks a reviewed value as not a catalog mechanism
+            self.aliases[normalize_key(value)] = tuple(id for id in ids if id in catalog_ids)
+
+        self.keys = [key for key, ids in self.aliases.items() if ids]
+        vocabulary = {}
+        rows, cols = [], []
+        for row, key in enumerate(self.keys):
+            for feature in set(text_features(key)):
+                rows.append(row)
+                cols.append(vocabulary.setdefault(feature, len(vocabulary)))
+        self.vocabulary = vocabulary
+        self.matrix = np.zeros((len(self.keys), len(vocabulary)), dtype=np.float32)
+        self.matrix[rows, cols] = 1.0
+        self.matrix /= np.maximum(np.linalg.norm(self.matrix, axis=1, keepdims=True), 1e-9)
+        self.memo: Dict[str, Resolution] = {}
+
+    def exact(self, key: str) -> Optional[Resolution]:
+        if key in IGNORED_VALUES:
+            return IGNORED
+        ids = self.aliases.get(key)
+        if ids is None:
+            return None
+        return Resolution(ids, "alias", 1.0) if ids else IGNORED
+
+    def fuzzy(self, keys: List[str]) -> List[Tuple[Tuple[str, ...], float]]:
+        """
+        Best alias match and its cosine similarity for each key.
+        """
+        if not self.keys:
+            return [((), 0.0)] * len(keys)
+        matches = []
+        for start in range(0, len(keys), FUZZY_BATCH_SIZE):
+            batch = keys[start:start + FUZZY_BATCH_SIZE]
+            query = np.zeros((len(batch), len(self.vocabulary)), dtype=np.float32)
+            for row, key in enumerate(batch):
+                features = set(text_features(key))
+                query[row, [self.vocabulary[f] for f in features if f in self.vocabulary]] = 1.0
+                # Normalize by all of the key's features so unmatched text lowers the score
+                query[row] /= max(len(features), 1) ** 0.5
+            scores = query @ self.matrix.T
+            best = scores.argmax(axis=1)
+            for row, column in enumerate(best.tolist()):
+                matches.append((self.aliases[self.keys[column]], float(scores[row, column])))
+        return matches
+
+    def resolve_many(self, values: Iterable[str]) -> List[Resolution]:
+        """
+        Resolve values in one batch, in input order.
+        """
+        values = list(values)
+        pending = {}
+        for value in values:
+            if value not in self.memo and value not in pending:
+                key = normalize_key(value)
+                resolution = self.exact(key)
+                if resolution is None:
+                    pending[value] = key
+                else:
+                    self.memo[value] = resolution
+        if not pending:
+            return [self.memo[value] for value in values]
+
+        parts = {}
+        for value in pending:
+            split = [part for part in (normalize_key(p) for p in PART_SEPARATOR_PATTERN.split(value)) if part]
+            if len(split) > 1:
+                parts[value] = split
+        fuzzy_keys = sorted(set(pending.values()) | {
+            part for split in parts.values() for part in split if self.exact(part) is None
+        })
+        matches = dict(zip(fuzzy_keys, self.fuzzy(fuzzy_keys)))
+
+        def match(key: str) -> Resolution:
+            resolution = self.exact(key)
+            if resolution is not None:
+                return resolution
+            ids, score = matches[key]
+            return Resolution(ids, "fuzzy", round(score, 4)) if score >= FUZZY_MIN_SCORE else UNRESOLVED
+
+        for value, key in pending.items():
+            resolution = None
+            if value in parts:
+                # Combined values resolve to the union of their parts when every part resolves
+                resolved = [match(part) for part in parts[value]]
+                ids = tuple(dict.fromkeys(id for r in resolved for id in r.ids))
+                if ids and all(r.method != "unresolved" for r in resolved):
+                    method = "fuzzy" if any(r.method == "fuzzy" for r in resolved) else "alias"
+                    resolution = Resolution(ids, method, min(r.score for r in resolved if r.ids))
+            self.memo[value] = resolution or match(key)
+        return [self.memo[value] for value in values]
+
+    def resolve(self, value: str) -> Resolution:
+        return self.resolve_many([value])[0]
+
+    def review_queue(self, counts: Dict[str, int]) -> List[Dict]:
+        """
+        Values a reviewer should map: unresolved ones and weak fuzzy matches, most frequent first.
+
+        Args:
+            counts: Occurrences of each value
+        """
+        flagged = [
+            (value, resolution) for value, resolution in zip(counts, self.resolve_many(counts))
+            if resolution.method == "unresolved" or (resolution.method == "fuzzy" and resolution.score < REVIEW_BELOW_SCORE)
+        ]
+        # Suggest the nearest alias even when it scored below the match threshold
+        suggestions = self.fuzzy([normalize_key(value) for value, _ in flagged])
+        queue = []
+        for (value, resolution), (ids, score) in zip(flagged, suggestions):
+            queue.append({"value": value, "count": counts[value], "method": resolution.method,
+                          "candidates": list(resolution.ids or ids), "score": round(resolution.score or score, 4)})
+        return sorted(queue, key=lambda entry: (-entry["count"], entry["value"]))
+
+def alias_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+def get_normalizer(catalog: List[Dict] = DETERIORATION_DATA,
+                   alias_path: str = DETERIORATION_ALIASES_PATH) -> DeteriorationNormalizer:
+    """
+    Normalizer for a catalog, built once per catalog object and alias file version.
+
+    Only the alias file's mtime is checked per call; the file is re-read and the
+    normalizer rebuilt when it changes.
+    """
+    key = (id(catalog), len(catalog), alias_path, alias_mtime(alias_path))
+    cached = normalizer_cache.get(key)
+    # The catalog is kept with its normalizer so a reused object id cannot match another list
+    if cached is None or cached[0] is not catalog:
+        cached = (catalog, DeteriorationNormalizer(catalog, load_aliases(alias_path)))
+        normalizer_cache.set(key, cached)
+    return cached[1]
+
+def count_values(source: str) -> Dict[str, int]:
+    """
+    Count Deterioration_Tx values in a folder of DXL files, or in a text file with one value per line.
+    """
+    counts = {}
+    if os.path.isdir(source):
+        for file_path in find_dxl_files(source):
+            try:
+                for document in iter_document_records(file_path, ("Deterioration_Tx",)):
+                    for value in document["items"].get("Deterioration_Tx", {}).values():
+                        counts[value] = counts.get(value, 0) + 1
+            except Exception as e:
+                print(f"Error processing {file_path.name}: {str(e)}")
+    else:
+        with open(source, encoding="utf-8") as f:
+            for line in f:
+                value = line.rstrip("\n")
+                counts[value] = counts.get(value, 0) + 1
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve Deterioration_Tx values to deterioration catalog IDs")
+    parser.add_argument("source", help="Folder containing DXL files, or a file with one value per line")
+    parser.add_argument("--aliases", default=DETERIORATION_ALIASES_PATH, help="Reviewed alias file (.json)")
+    parser.add_argument("--review", default=REVIEW_QUEUE_PATH, help="Where to write values needing review")
+    args = parser.parse_args()
+
+    counts = count_values(args.source)
+    normalizer = get_normalizer(alias_path=args.aliases)
+    resolutions = normalizer.resolve_many(counts)
+    by_method = {}
+    for value, resolution in zip(counts, resolutions):
+        by_method[resolution.method] = by_method.get(resolution.method, 0) + counts[value]
+    queue = normalizer.review_queue(counts)
+    with open(args.review, "w", encoding="utf-8") as f:
+        json.dump(queue, f, indent=2)
+
+    total = sum(counts.values())
+    summary = ", ".join(f"{count} {method}" for method, count in sorted(by_method.items()))
+    print(f"Resolved {total} values ({len(counts)} distinct): {summary}")
+    print(f"{len(queue)} distinct values queued for review in {args.review}")
+
+if __name__ == "__main__":
+    main()
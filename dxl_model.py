@@ -0,0 +1,245 @@
+import math
+import re
+import sys
+from array import array
+from pathlib import Path
+
+from field_extraction import clean_text, find_dxl_files, iter_dxl_documents, parse_note_info
+
+# Since DXL files might not be well-formed XML, items are matched with regex; a
+# self-closing <item .../> has no value and must not run on into the next item
+ITEM_PATTERN = re.compile(r'<item\s+name=[\'"]([^\'"]+)[\'"][^>]*(?<!/)>\s*(.*?)</item>', re.DOTALL)
+# Empty values are exported as a self-closing <text/>, which must still take a textlist position
+TEXT_PATTERN = re.compile(r'<text\s*(?:/>|>(.*?)</text\s*>)', re.DOTALL)
+NUMBER_PATTERN = re.compile(r'<number[^>]*>([^<]*)</number>')
+DATETIME_PATTERN = re.compile(r'<datetime[^>]*>([^<]*)</datetime>')
+FORM_PATTERN = re.compile(r'<document\s[^>]*?form=[\'"]([^\'"]*)[\'"]')
+
+# Values up to this length are interned; longer free text is rarely repeated
+INTERN_MAX_LENGTH = 64
+
+# (name tuple, {name: slot}) per distinct sequence of <number> item names, shared
+# by every document with the same layout
+number_layouts = {}
+# Layouts kept for sharing; documents with further layouts get their own copy
+NUMBER_LAYOUTS_MAX = 4096
+
+def intern_value(text):
+    """
+    Intern short, frequently repeated values such as 'Corrosion' or 'Yes'.
+    """
+    if len(text) <= INTERN_MAX_LENGTH:
+        return sys.intern(text)
+    return text
+
+def number_layout(names):
+    """
+    Return the shared (name tuple, {name: slot}) layout for a sequence of number item names.
+    """
+    names = tuple(names)
+    layout = number_layouts.get(names)
+    if layout is None:
+        slots = {}
+        for slot, name in enumerate(names):
+            # The first occurrence wins if a document repeats an item name
+            slots.setdefault(name, slot)
+        layout = (names, slots)
+        if len(number_layouts) < NUMBER_LAYOUTS_MAX:
+            number_layouts[names] = layout
+    return layout
+
+def parse_number(text):
+    """
+    Convert a DXL <number> payload to float, using NaN for unparseable values.
+    """
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan
+
+class DxlDocument:
+    """
+    Compact, typed representation of every item in one DXL document.
+
+    Item names and short values are interned so the thousands of repeated names
+    and values across a corpus share one string each; numbers are held in
+    array('d') columns instead of one float object per item. Documents with the
+    same <number> item names share one name tuple and name-to-slot index.
+    """
+
+    __slots__ = (
+        "unid", "sequence", "modified", "form",
+        "texts", "textlists", "number_names", "number_slots", "number_values",
+        "numberlists", "datetimes"
+    )
+
+    def __init__(self, unid=None, sequence=None, modified=None, form=None):
+        self.unid = unid
+        self.sequence = sequence
+        self.modified = modified
+        self.form = form
+        self.texts = {}
+        self.textlists = {}
+        self.number_names, self.number_slots = number_layout(())
+        self.number_values = array('d')
+        self.numberlists = {}
+        self.datetimes = {}
+
+    def set_numbers(self, names, values):
+        """
+        Replace the <number> items with the given names and values.
+        """
+        self.number_names, self.number_slots = number_layout(names)
+        self.number_values = array('d', values)
+
+    def add_number(self, name, value):
+        self.number_names, self.number_slots = number_layout(self.number_names + (name,))
+        self.number_values.append(value)
+
+    def number(self, name, default=None):
+        """
+        Return the value of a <number> item, or default if the document has none.
+        """
+        slot = self.number_slots.get(name)
+        return default if slot is None else self.number_values[slot]
+
+    def get(self, name, default=None):
+        """
+        Return the value of an item of any type, or default if it is missing.
+        """
+        for values in (self.texts, self.textlists, self.datetimes, self.numberlists):
+            if name in values:
+                return values[name]
+        return self.number(name, default)
+
+    def items_with_prefix(self, prefix):
+        """
+        Return {item name: text} for text items whose name starts with prefix.
+        """
+        return {name: text for name, text in self.texts.items() if name.startswith(prefix)}
+
+    def __repr__(self):
+        return f"DxlDocument(unid={self.unid!r}, form={self.form!r}, items={self.item_count()})"
+
+    def item_count(self):
+        return (len(self.texts) + len(self.textlists) + len(self.number_names)
+                + len(self.numberlists) + len(self.datetimes))
+
+def parse_dxl_document(content):
+    """
+    Parse the text of one <document> element into a DxlDocument.
+
+    Text, textlist, number, numberlist and datetime(list) items are captured;
+    rich text and raw item data (attachments, signatures) are skipped.
+
+    Args:
+        content: Text of one <document> element
+
+    Returns:
+        DxlDocument with every typed item
+    """
+    info = parse_note_info(content)
+    form = FORM_PATTERN.search(content)
+    document = DxlDocument(
+        unid=info["unid"],
+        sequence=int(info["sequence"]) if info["sequence"] and info["sequence"].isdigit() else None,
+        modified=info["modified"],
+        form=sys.intern(form.group(1)) if form else None
+    )
+
+    number_names = []
+    number_values = []
+    for name, body in ITEM_PATTERN.findall(content):
+        name = sys.intern(name)
+        if body.startswith('<textlist'):
+            document.textlists[name] = tuple(intern_value(clean_text(t)) for t in TEXT_PATTERN.findall(body))
+        elif body.startswith('<text'):
+            match = TEXT_PATTERN.match(body)
+            document.texts[name] = intern_value(clean_text(match.group(1) or '')) if match else ''
+        elif body.startswith('<numberlist'):
+            document.numberlists[name] = array('d', (parse_number(n) for n in NUMBER_PATTERN.findall(body)))
+        elif body.startswith('<number'):
+            match = NUMBER_PATTERN.match(body)
+            number_names.append(name)
+            number_values.append(parse_number(match.group(1)) if match else math.nan)
+        elif body.startswith('<datetime'):
+            values = DATETIME_PATTERN.findall(body)
+            document.datetimes[name] = values[0] if len(values) == 1 else tuple(values)
+
+    document.set_numbers(number_names, number_values)
+    return document
+
+class DxlCorpus:
+    """
+    In-memory collection of DxlDocument records with column-style access.
+
+    Numeric columns are materialised on demand as array('d') aligned with the
+    document order, with NaN where a document lacks the item.
+    """
+
+    __slots__ = ("documents", "number_columns")
+
+    def __init__(self, documents=None):
+        self.documents = list(documents or [])
+        self.number_columns = {}
+
+    @classmethod
+    def from_folder(cls, folder_path):
+        """
+        Build a corpus from every document in a folder of DXL files.
+
+        Args:
+            folder_path: Path to the folder containing DXL files
+
+        Returns:
+            DxlCorpus with one DxlDocument per <document> element
+        """
+        folder = Path(folder_path)
+
+        # Check if folder exists
+        if not folder.exists() or not folder.is_dir():
+            raise ValueError(f"Folder not found: {folder_path}")
+
+        corpus = cls()
+        for file_path in find_dxl_files(folder):
+            try:
+                for content in iter_dxl_documents(file_path):
+                    corpus.add(parse_dxl_document(content))
+            except Exception as e:
+                print(f"Error processing {file_path.name}: {str(e)}")
+        return corpus
+
+    def add(self, document):
+        self.documents.append(document)
+        self.number_columns.clear()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def number_column(self, name):
+        """
+        Return the values of a <number> item across all documents as array('d').
+        """
+        if name not in self.number_columns:
+            self.number_columns[name] = array('d', (d.number(name, math.nan) for d in self.documents))
+        return self.number_columns[name]
+
+    def text_column(self, name, default=None):
+        """
+        Return the values of a text item across all documents.
+        """
+        return [d.texts.get(name, default) for d in self.documents]
+
+    def value_counts(self, name):
+        """
+        Count the distinct non-empty values of a text item across the corpus.
+        """
+        counts = {}
+        for document in self.documents:
+            value = document.texts.get(name)
+            if value:
+                counts[value] = counts.get(value, 0) + 1
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
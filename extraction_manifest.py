@@ -0,0 +1,147 @@
+import json
+import sqlite3
+
+class ExtractionManifest:
+    """
+    SQLite record of what incremental extraction has already seen.
+
+    Files are fingerprinted by mtime and size, and documents by UNID, sequence
+    and content hash, next to their extracted items. Each changed file rewrites
+    only its own rows, so the work of a run grows with the files that changed
+    rather than with the corpus.
+    """
+
+    def __init__(self, path, families):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    path TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    unid TEXT,
+                    sequence TEXT,
+                    modified TEXT,
+                    hash TEXT NOT NULL,
+                    items TEXT NOT NULL,
+                    PRIMARY KEY (path, position)
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS documents_unid ON documents (unid)")
+
+            # Stored items only cover the families they were extracted for, so start over on a change
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'families'").fetchone()
+            if row is None or json.loads(row[0]) != list(families):
+                self.connection.execute("DELETE FROM files")
+                self.connection.execute("DELETE FROM documents")
+                self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('families', ?)",
+                                        (json.dumps(list(families)),))
+
+    def file_unchanged(self, key, stat):
+        """
+        Whether a file has the same mtime and size as when it was last recorded.
+        """
+        row = self.connection.execute("SELECT mtime, size FROM files WHERE path = ?", (key,)).fetchone()
+        return row is not None and row[0] == stat.st_mtime and row[1] == stat.st_size
+
+    def known_document(self, unid):
+        """
+        The recorded document with a UNID as a dictionary with 'sequence', 'hash' and 'items', or None.
+        """
+        if not unid:
+            return None
+        row = self.connection.execute(
+            "SELECT sequence, hash, items FROM documents WHERE unid = ? LIMIT 1", (unid,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"sequence": row[0], "hash": row[1], "items": json.loads(row[2])}
+
+    def replace_file(self, key, stat, records):
+        """
+        Record a re-read file and its documents, replacing what was stored for it.
+
+        Returns:
+            UNIDs that were stored for the file before
+        """
+        with self.connection:
+            previous = self.file_unids(key)
+            self.connection.execute("DELETE FROM documents WHERE path = ?", (key,))
+            self.connection.executemany(
+                "INSERT INTO documents (path, position, unid, sequence, modified, hash, items) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(key, position, r["unid"], r["sequence"], r["modified"], r["hash"], json.dumps(r["items"]))
+                 for position, r in enumerate(records)]
+            )
+            self.connection.execute("INSERT OR REPLACE INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                                    (key, stat.st_mtime, stat.st_size))
+        return previous
+
+    def remove_files(self, keys):
+        """
+        Forget files that are no longer present.
+
+        Returns:
+            UNIDs that were stored for them
+        """
+        removed = set()
+        with self.connection:
+            for key in keys:
+                removed |= self.file_unids(key)
+                self.connection.execute("DELETE FROM documents WHERE path = ?", (key,))
+                self.connection.execute("DELETE FROM files WHERE path = ?", (key,))
+        return removed
+
+    def file_unids(self, key):
+        return {row[0] for row in self.connection.execute(
+            "SELECT unid FROM documents WHERE path = ? AND unid IS NOT NULL", (key,))}
+
+    def file_keys(self):
+        return {row[0] for row in self.connection.execute("SELECT path FROM files")}
+
+    def missing_unids(self, unids):
+        """
+        Those of the given UNIDs that no recorded document has any more.
+        """
+        present = set()
+        unids = list(unids)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(unids), 500):
+            batch = unids[start:start + 500]
+            present.update(row[0] for row in self.connection.execute(
+                f"SELECT DISTINCT unid FROM documents WHERE unid IN ({', '.join('?' * len(batch))})", batch))
+        return set(unids) - present
+
+    def iter_files(self):
+        """
+        Yield (file key, document records) for every recorded file in path order.
+        """
+        key, records = None, []
+        for path, unid, sequence, modified, items in self.connection.execute(
+                "SELECT path, unid, sequence, modified, items FROM documents ORDER BY path, position"):
+            if path != key:
+                if key is not None:
+                    yield key, records
+                key, records = path, []
+            records.append({"unid": unid, "sequence": sequence, "modified": modified, "items": json.loads(items)})
+        if key is not None:
+            yield key, records
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
@@ -1,56 +1,417 @@
+import argparse
+import hashlib
+import io
+import mmap
 import os
 import re
+import time
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
-def extract_field_tx_6_items(file_path):
+from extraction_manifest import ExtractionManifest
+from output_sinks import JsonlSink, SqliteSink
+
+# Item-name families extracted in a single pass over each DXL file
+ITEM_FAMILIES = (
+    "Field_Tx_6",
+    "Deterioration_Tx",
+    "Location_Tx",
+    "DetCredible_Tx",
+    "DetComment_Tx",
+)
+
+# Precompiled patterns used to clean up extracted text
+BREAK_PATTERN = re.compile(r'<break\s*/>')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Precompiled patterns used to split DXL exports into documents
+DOCUMENT_START_PATTERN = re.compile(r'<document[\s>]')
+DOCUMENT_END_TAG = '</document>'
+NOTEINFO_PATTERN = re.compile(r'<noteinfo\s+([^>]*)>')
+ATTRIBUTE_PATTERN = re.compile(r'(\w+)=[\'"]([^\'"]*)[\'"]')
+MODIFIED_PATTERN = re.compile(r'<modified>\s*<datetime[^>]*>([^<]*)</datetime>')
+
+# Bytes equivalents used by the memory-mapped fast path
+DOCUMENT_END_BYTES = b'</document>'
+NOTEINFO_BYTES_PATTERN = re.compile(rb'<noteinfo\s+([^>]*)>')
+MODIFIED_BYTES_PATTERN = re.compile(rb'<modified>\s*<datetime[^>]*>([^<]*)</datetime>')
+
+# Number of characters read per chunk when streaming large DXL exports
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Files larger than this many bytes are split into document-aligned ranges for parallel extraction
+DEFAULT_RANGE_SIZE = 64 << 20
+DOCUMENT_START_BYTES_PATTERN = re.compile(rb'<document[\s>]')
+
+# Default location of the manifest used for incremental re-extraction
+DEFAULT_MANIFEST_FILE = "extraction_manifest.sqlite"
+
+@lru_cache(maxsize=None)
+def compile_item_pattern(families):
     """
-    Extract text from items with name 'Field_Tx_6_{number}' in a DXL file.
+    Build a single compiled pattern matching '<family>_{index}' text items for all families.
+    
+    Args:
+        families: Tuple of item-name families, e.g. ('Field_Tx_6', 'Deterioration_Tx')
+    
+    Returns:
+        Compiled pattern capturing the family, the index (e.g. '3' or '3_1') and the raw text
+    """
+    names = "|".join(re.escape(family) for family in families)
+    # Since DXL files might not be well-formed XML, use regex to extract items
+    return re.compile(
+        r'<item\s+name=[\'"](' + names + r')_(\d+(?:_\d+)*)[\'"]>\s*<text>(.*?)</text>\s*</item>',
+        re.DOTALL
+    )
+
+@lru_cache(maxsize=None)
+def compile_item_bytes_pattern(families):
+    """
+    Bytes version of compile_item_pattern, for scanning memory-mapped files without decoding.
+    """
+    names = b"|".join(re.escape(family.encode('ascii')) for family in families)
+    return re.compile(
+        rb'<item\s+name=[\'"](' + names + rb')_(\d+(?:_\d+)*)[\'"]>\s*<text>(.*?)</text>\s*</item>',
+        re.DOTALL
+    )
+
+def clean_text(text):
+    """
+    Replace <break/> with newlines and collapse whitespace in an item's raw text.
+    """
+    clean = BREAK_PATTERN.sub('\n', text)
+    return WHITESPACE_PATTERN.sub(' ', clean).strip()
+
+def extract_items_from_text(content, families=ITEM_FAMILIES):
+    """
+    Extract text items for every requested family from DXL content in one scan.
+    
+    Args:
+        content: DXL content as a string
+        families: Iterable of item-name families to extract
+    
+    Returns:
+        Dictionary with families as keys and {item name: text} dictionaries as values
+    """
+    families = tuple(families)
+    results = {family: {} for family in families}
+    for family, index, text in compile_item_pattern(families).findall(content):
+        results[family][f'{family}_{index}'] = clean_text(text)
+    return results
+
+def extract_items(file_path, families=ITEM_FAMILIES):
+    """
+    Extract text items for every requested family from a DXL file, reading it once.
     
     Args:
         file_path: Path to the DXL file
+        families: Iterable of item-name families to extract
     
     Returns:
-        Dictionary with item names as keys and their text content as values
+        Dictionary with families as keys and {item name: text} dictionaries as values
     """
-    # Read the file content
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
+    return extract_items_from_text(content, families)
+
+def iter_dxl_documents(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield the raw text of each <document> element in a DXL file, reading it in chunks.
     
-    # Since DXL files might not be well-formed XML, use regex to extract items
-    pattern = r'<item\s+name=[\'"]Field_Tx_6_(\d+)[\'"]>\s*<text>(.*?)</text>\s*</item>'
-    matches = re.findall(pattern, content, re.DOTALL)
+    Memory use is bounded by the largest single document rather than the file size,
+    so multi-GB database exports can be scanned one document at a time. Like the
+    regex extractors, this does not require well-formed XML: a document missing its
+    closing tag ends where the next one starts, or at the end of the file.
+    
+    Args:
+        file_path: Path to the DXL file
+        chunk_size: Number of characters to read per chunk
+    
+    Yields:
+        Text of each document, from '<document' up to and including '</document>'
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        yield from iter_documents_from_stream(f, chunk_size)
+
+def iter_documents_from_stream(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield the raw text of each <document> element read from an open text stream.
+    
+    Args:
+        stream: Text file object positioned at the start of DXL content
+        chunk_size: Number of characters to read per chunk
+    
+    Yields:
+        Text of each document, from '<document' up to and including '</document>'
+    """
+    buffer = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        # Only rescan the part of the buffer a new tag could have completed in
+        search_from = max(0, len(buffer) - len(DOCUMENT_END_TAG))
+        buffer += chunk
+        
+        while True:
+            start = DOCUMENT_START_PATTERN.search(buffer)
+            if not start:
+                # Nothing but export headers so far; keep only a possible partial tag
+                buffer = buffer[-len(DOCUMENT_END_TAG):]
+                break
+            
+            next_start = DOCUMENT_START_PATTERN.search(buffer, start.end())
+            end = buffer.find(DOCUMENT_END_TAG, max(search_from, start.start()))
+            if end != -1 and (not next_start or end < next_start.start()):
+                end += len(DOCUMENT_END_TAG)
+            elif next_start:
+                # Unterminated document: it ends where the next one begins
+                end = next_start.start()
+            else:
+                break
+            
+            yield buffer[start.start():end]
+            buffer = buffer[end:]
+            search_from = 0
+        
+        if not chunk:
+            break
+    
+    # A truncated final document is still returned for best-effort extraction
+    start = DOCUMENT_START_PATTERN.search(buffer)
+    if start:
+        yield buffer[start.start():]
+
+def parse_note_info(content):
+    """
+    Read the note UNID, sequence number and modified time from a DXL document.
+    
+    Args:
+        content: Text of one <document> element
+    
+    Returns:
+        Dictionary with 'unid', 'sequence' and 'modified' (None where missing)
+    """
+    noteinfo = NOTEINFO_PATTERN.search(content)
+    attributes = dict(ATTRIBUTE_PATTERN.findall(noteinfo.group(1))) if noteinfo else {}
+    modified = MODIFIED_PATTERN.search(content)
+    return {
+        "unid": attributes.get("unid"),
+        "sequence": attributes.get("sequence"),
+        "modified": modified.group(1) if modified else None
+    }
+
+def parse_document_record(content, families=ITEM_FAMILIES):
+    """
+    Extract note identity and text items from the text of a single DXL document.
+    
+    Args:
+        content: Text of one <document> element
+        families: Iterable of item-name families to extract
+    
+    Returns:
+        Dictionary with 'unid', 'sequence', 'modified' and 'items' (family -> {item name: text})
+    """
+    record = parse_note_info(content)
+    record["items"] = extract_items_from_text(content, families)
+    return record
+
+def iter_document_records(file_path, families=ITEM_FAMILIES, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream a DXL file and yield one extracted record per <document> element.
+    
+    Args:
+        file_path: Path to the DXL file
+        families: Iterable of item-name families to extract
+        chunk_size: Number of characters to read per chunk
+    
+    Yields:
+        Document records as returned by parse_document_record
+    """
+    families = tuple(families)
+    for content in iter_dxl_documents(file_path, chunk_size):
+        yield parse_document_record(content, families)
+
+def iter_document_spans(buffer, start=0, end=None):
+    """
+    Yield the (start, end) offsets of each <document> element in a bytes-like buffer.
+    
+    Follows the same rules as iter_documents_from_stream: a document missing its
+    closing tag ends where the next one starts, or at the end of the buffer.
+    
+    Args:
+        buffer: Bytes or memory-mapped file
+        start: Offset to start scanning from
+        end: Offset to stop scanning at (defaults to the end of the buffer)
+    
+    Yields:
+        Tuples of (start, end) byte offsets
+    """
+    end = len(buffer) if end is None else end
+    match = DOCUMENT_START_BYTES_PATTERN.search(buffer, start, end)
+    while match:
+        next_match = DOCUMENT_START_BYTES_PATTERN.search(buffer, match.end(), end)
+        limit = next_match.start() if next_match else end
+        close = buffer.find(DOCUMENT_END_BYTES, match.start(), limit)
+        yield match.start(), close + len(DOCUMENT_END_BYTES) if close != -1 else limit
+        match = next_match
+
+def parse_document_record_bytes(buffer, start, end, families=ITEM_FAMILIES):
+    """
+    Extract a document record from a byte span, decoding only the matched payloads.
+    
+    Args:
+        buffer: Bytes or memory-mapped file
+        start: Offset of the document start
+        end: Offset of the document end
+        families: Tuple of item-name families to extract
     
-    results = {}
-    for number, text in matches:
-        item_name = f'Field_Tx_6_{number}'
-        # Clean up the text - replace <break/> with newlines and remove extra whitespace
-        clean_text = re.sub(r'<break\s*/>', '\n', text)
-        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-        results[item_name] = clean_text
+    Returns:
+        Document record in the same shape as parse_document_record
+    """
+    noteinfo = NOTEINFO_BYTES_PATTERN.search(buffer, start, end)
+    attributes = {}
+    if noteinfo:
+        attributes = dict(ATTRIBUTE_PATTERN.findall(noteinfo.group(1).decode('utf-8')))
+    modified = MODIFIED_BYTES_PATTERN.search(buffer, start, end)
+    
+    items = {family: {} for family in families}
+    for match in compile_item_bytes_pattern(families).finditer(buffer, start, end):
+        family = match.group(1).decode('ascii')
+        items[family][f'{family}_{match.group(2).decode("ascii")}'] = clean_text(match.group(3).decode('utf-8'))
+    
+    return {
+        "unid": attributes.get("unid"),
+        "sequence": attributes.get("sequence"),
+        "modified": modified.group(1).decode('utf-8') if modified else None,
+        "items": items
+    }
+
+def iter_document_records_mmap(file_path, families=ITEM_FAMILIES, byte_range=None):
+    """
+    Memory-map a DXL file and yield one record per <document> element.
+    
+    A zero-copy alternative to iter_document_records: compiled bytes patterns run
+    directly over the mapped file, and only the matched <text> payloads and note
+    attributes are decoded. Rich text, attachments and signatures are never copied
+    into Python strings.
+    
+    Args:
+        file_path: Path to the DXL file
+        families: Iterable of item-name families to extract
+        byte_range: Optional (start, end) offsets to restrict the scan to
+    
+    Yields:
+        Document records as returned by parse_document_record
+    """
+    families = tuple(families)
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start, end = byte_range or (0, len(mapped))
+            for span_start, span_end in iter_document_spans(mapped, start, end):
+                yield parse_document_record_bytes(mapped, span_start, span_end, families)
+
+def extract_items_mmap(file_path, families=ITEM_FAMILIES):
+    """
+    Memory-mapped counterpart of extract_items for a whole DXL file.
+    
+    Args:
+        file_path: Path to the DXL file
+        families: Iterable of item-name families to extract
     
+    Returns:
+        Dictionary with families as keys and {item name: text} dictionaries as values
+    """
+    families = tuple(families)
+    results = {family: {} for family in families}
+    for record in iter_document_records_mmap(file_path, families):
+        for family, items in record["items"].items():
+            results[family].update(items)
     return results
 
-def process_dxl_files(folder_path):
+def extract_field_tx_6_items(file_path):
     """
-    Process all DXL files in the specified folder.
+    Extract text from items with name 'Field_Tx_6_{number}' in a DXL file.
+    
+    Args:
+        file_path: Path to the DXL file
+    
+    Returns:
+        Dictionary with item names as keys and their text content as values
+    """
+    return extract_items(file_path, ("Field_Tx_6",))["Field_Tx_6"]
+
+def find_dxl_files(folder):
+    """
+    List all .dxl files under a folder in a deterministic (sorted) order.
+    """
+    return sorted(Path(folder).glob('**/*.dxl'))
+
+def document_key(file_path, record, document_count):
+    """
+    Key under which a document's items are reported.
+    
+    Single-note exports keep the file name as before; documents from
+    multi-document database exports are told apart by their UNID.
+    """
+    name = Path(file_path).name
+    if document_count == 1:
+        return name
+    return f"{name}#{record['unid']}"
+
+def merge_file_records(all_results, file_path, records):
+    """
+    Merge the document records extracted from one file into per-family results.
+    
+    Args:
+        all_results: Dictionary with families as keys and {document key: items} as values
+        file_path: Path to the DXL file the records came from
+        records: List of document records from that file
+    """
+    for record in records:
+        key = document_key(file_path, record, len(records))
+        for family, items in record["items"].items():
+            if items:
+                all_results.setdefault(family, {})[key] = items
+
+def summarize_records(records):
+    """
+    Describe the number of documents and items per family found in one file.
+    """
+    counts = {}
+    for record in records:
+        for family, items in record["items"].items():
+            counts[family] = counts.get(family, 0) + len(items)
+    summary = ", ".join(f"{count} {family}" for family, count in counts.items())
+    if len(records) == 1:
+        return f"{summary} items"
+    return f"{len(records)} documents, {summary} items"
+
+def process_dxl_folder(folder_path, families=ITEM_FAMILIES, use_mmap=False):
+    """
+    Process all DXL files in the specified folder, extracting every family in a single pass.
     
     Args:
         folder_path: Path to the folder containing DXL files
+        families: Iterable of item-name families to extract
+        use_mmap: Scan memory-mapped bytes instead of decoded text
     
     Returns:
-        Dictionary with file names as keys and extracted items as values
+        Dictionary with families as keys and {file name: extracted items} dictionaries as values
     """
     folder = Path(folder_path)
+    families = tuple(families)
     
     # Check if folder exists
     if not folder.exists() or not folder.is_dir():
         raise ValueError(f"Folder not found: {folder_path}")
     
-    all_results = {}
+    all_results = {family: {} for family in families}
     
     # Find all .dxl files in the folder
-    dxl_files = list(folder.glob('**/*.dxl'))
+    dxl_files = find_dxl_files(folder)
     
     if not dxl_files:
         print(f"No .dxl files found in {folder_path}")
@@ -59,15 +420,305 @@ def process_dxl_files(folder_path):
     # Process each file
     for file_path in dxl_files:
         try:
-            results = extract_field_tx_6_items(file_path)
-            if results:
-                all_results[file_path.name] = results
-            print(f"Processed {file_path.name} - Found {len(results)} Field_Tx_6 items")
+            if use_mmap:
+                records = list(iter_document_records_mmap(file_path, families))
+            else:
+                records = list(iter_document_records(file_path, families))
+            merge_file_records(all_results, file_path, records)
+            print(f"Processed {file_path.name} - Found {summarize_records(records)}")
+        except Exception as e:
+            print(f"Error processing {file_path.name}: {str(e)}")
+    
+    return all_results
+
+def split_dxl_file(file_path, range_size=DEFAULT_RANGE_SIZE):
+    """
+    Split a large DXL export into byte ranges that each start at a <document> boundary.
+    
+    Args:
+        file_path: Path to the DXL file
+        range_size: Approximate number of bytes per range
+    
+    Returns:
+        List of (start, end) byte offsets, or [None] if the file should be read whole
+    """
+    size = os.path.getsize(file_path)
+    if size <= range_size:
+        return [None]
+    
+    boundaries = [0]
+    overlap = len(b'<document ')
+    with open(file_path, 'rb') as f:
+        offset = range_size
+        while offset < size:
+            # Scan forward from the tentative split point to the next document start
+            f.seek(offset)
+            position = offset
+            found = None
+            while found is None:
+                block = f.read(DEFAULT_CHUNK_SIZE)
+                if not block:
+                    break
+                match = DOCUMENT_START_BYTES_PATTERN.search(block)
+                if match:
+                    found = position + match.start()
+                else:
+                    position += len(block) - overlap
+                    f.seek(position)
+                    if len(block) <= overlap:
+                        break
+            if found is None:
+                break
+            boundaries.append(found)
+            offset = found + range_size
+    
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+def extract_dxl_task(task):
+    """
+    Extract document records from a whole DXL file or from one byte range of it.
+    
+    Runs in a worker process; errors are returned rather than raised so the parent
+    can report them per file in submission order.
+    
+    Args:
+        task: Tuple of (file path, families, byte range or None, use mmap)
+    
+    Returns:
+        Dictionary with 'file', 'range', 'records', 'bytes' and 'error'
+    """
+    file_path, families, byte_range, use_mmap = task
+    result = {"file": file_path, "range": byte_range, "records": [], "bytes": 0, "error": None}
+    try:
+        if use_mmap:
+            result["records"] = list(iter_document_records_mmap(file_path, families, byte_range))
+            result["bytes"] = byte_range[1] - byte_range[0] if byte_range else os.path.getsize(file_path)
+        elif byte_range is None:
+            result["records"] = list(iter_document_records(file_path, families))
+            result["bytes"] = os.path.getsize(file_path)
+        else:
+            start, end = byte_range
+            with open(file_path, 'rb') as f:
+                f.seek(start)
+                data = f.read(end - start)
+            stream = io.StringIO(data.decode('utf-8'))
+            result["records"] = [
+                parse_document_record(content, families)
+                for content in iter_documents_from_stream(stream)
+            ]
+            result["bytes"] = len(data)
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+def process_dxl_folder_parallel(folder_path, families=ITEM_FAMILIES, workers=None,
+                                range_size=DEFAULT_RANGE_SIZE, use_mmap=False):
+    """
+    Process all DXL files in the specified folder across a pool of worker processes.
+    
+    Small files are handled one per task and large exports are split into
+    document-aligned byte ranges. Results are merged in sorted file order, so the
+    output matches process_dxl_folder regardless of which worker finishes first.
+    
+    Args:
+        folder_path: Path to the folder containing DXL files
+        families: Iterable of item-name families to extract
+        workers: Number of worker processes (defaults to the CPU count)
+        range_size: Approximate number of bytes per task for large files
+        use_mmap: Scan memory-mapped bytes instead of decoded text
+    
+    Returns:
+        Dictionary with families as keys and {file name: extracted items} dictionaries as values
+    """
+    folder = Path(folder_path)
+    families = tuple(families)
+    workers = workers or os.cpu_count() or 1
+    
+    # Check if folder exists
+    if not folder.exists() or not folder.is_dir():
+        raise ValueError(f"Folder not found: {folder_path}")
+    
+    all_results = {family: {} for family in families}
+    
+    # Find all .dxl files in the folder
+    dxl_files = find_dxl_files(folder)
+    
+    if not dxl_files:
+        print(f"No .dxl files found in {folder_path}")
+        return all_results
+    
+    tasks = []
+    for file_path in dxl_files:
+        try:
+            tasks.extend((file_path, families, byte_range, use_mmap)
+                         for byte_range in split_dxl_file(file_path, range_size))
+        except Exception as e:
+            print(f"Error processing {file_path.name}: {str(e)}")
+    if not tasks:
+        return all_results
+    print(f"Extracting {len(dxl_files)} files as {len(tasks)} tasks on {workers} workers")
+    
+    started = time.perf_counter()
+    total_bytes = 0
+    files_done = 0
+    current_file = None
+    file_records = []
+    file_failed = False
+    
+    def finish_file():
+        if current_file is not None and not file_failed:
+            merge_file_records(all_results, current_file, file_records)
+            print(f"Processed {current_file.name} - Found {summarize_records(file_records)}")
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields results in submission order, keeping the merge deterministic
+        chunksize = max(1, len(tasks) // (workers * 4))
+        for done, result in enumerate(executor.map(extract_dxl_task, tasks, chunksize=chunksize), 1):
+            if result["file"] != current_file:
+                finish_file()
+                if current_file is not None:
+                    files_done += 1
+                current_file, file_records, file_failed = result["file"], [], False
+            
+            if result["error"]:
+                location = f" bytes {result['range'][0]}-{result['range'][1]}" if result["range"] else ""
+                print(f"Error processing {current_file.name}{location}: {result['error']}")
+                file_failed = True
+            file_records.extend(result["records"])
+            total_bytes += result["bytes"]
+            
+            if done % 100 == 0 or done == len(tasks):
+                elapsed = time.perf_counter() - started
+                print(f"Progress: {done}/{len(tasks)} tasks, "
+                      f"{done / elapsed:.1f} tasks/s, {total_bytes / elapsed / (1 << 20):.1f} MB/s")
+        finish_file()
+        files_done += 1
+    
+    elapsed = time.perf_counter() - started
+    print(f"Extracted {files_done} files ({total_bytes / (1 << 20):.1f} MB) in {elapsed:.1f}s")
+    return all_results
+
+def export_dxl_folder(folder_path, sinks, families=ITEM_FAMILIES):
+    """
+    Stream every document in a folder of DXL files straight into output sinks.
+    
+    Nothing is accumulated across documents, so memory stays flat however large
+    the corpus is; the sinks batch their own writes.
+    
+    Args:
+        folder_path: Path to the folder containing DXL files
+        sinks: List of sinks with write_document(file_name, record) and flush()
+        families: Iterable of item-name families to extract
+    
+    Returns:
+        Number of documents exported
+    """
+    folder = Path(folder_path)
+    families = tuple(families)
+    
+    # Check if folder exists
+    if not folder.exists() or not folder.is_dir():
+        raise ValueError(f"Folder not found: {folder_path}")
+    
+    documents = 0
+    for file_path in find_dxl_files(folder):
+        try:
+            for record in iter_document_records(file_path, families):
+                for sink in sinks:
+                    sink.write_document(file_path.name, record)
+                documents += 1
         except Exception as e:
             print(f"Error processing {file_path.name}: {str(e)}")
     
+    for sink in sinks:
+        sink.flush()
+    return documents
+
+def process_dxl_folder_incremental(folder_path, families=ITEM_FAMILIES, manifest_path=DEFAULT_MANIFEST_FILE):
+    """
+    Process DXL files in the specified folder, re-extracting only new or revised documents.
+    
+    The SQLite manifest records each file's mtime and size and, per document, its
+    UNID, sequence, modified time, content hash and extracted items. Unchanged
+    files are skipped without being opened, and only the rows of changed files are
+    rewritten; in changed files, documents whose UNID, sequence and hash match the
+    manifest reuse their stored items. Files that can no longer be read keep their
+    previous entry. Notes that no longer appear in any file are dropped.
+    
+    Args:
+        folder_path: Path to the folder containing DXL files
+        families: Iterable of item-name families to extract
+        manifest_path: Path to the SQLite manifest to read and update
+    
+    Returns:
+        Dictionary with families as keys and {file name: extracted items} dictionaries as values
+    """
+    folder = Path(folder_path)
+    families = tuple(families)
+    
+    # Check if folder exists
+    if not folder.exists() or not folder.is_dir():
+        raise ValueError(f"Folder not found: {folder_path}")
+    
+    stats = {"unchanged_files": 0, "reused": 0, "extracted": 0}
+    with ExtractionManifest(manifest_path, families) as manifest:
+        seen = set()
+        replaced = set()
+        for file_path in find_dxl_files(folder):
+            key = str(file_path.relative_to(folder))
+            seen.add(key)
+            try:
+                stat = file_path.stat()
+                if manifest.file_unchanged(key, stat):
+                    stats["unchanged_files"] += 1
+                    continue
+                
+                records = []
+                reused = extracted = 0
+                for content in iter_dxl_documents(file_path):
+                    record = parse_note_info(content)
+                    record["hash"] = hashlib.sha1(content.encode('utf-8')).hexdigest()
+                    known = manifest.known_document(record["unid"])
+                    if (known and known["sequence"] == record["sequence"]
+                            and known["hash"] == record["hash"]):
+                        record["items"] = known["items"]
+                        reused += 1
+                    else:
+                        record["items"] = extract_items_from_text(content, families)
+                        extracted += 1
+                    records.append(record)
+            except Exception as e:
+                # Keep the previous entry so an unreadable file does not look deleted
+                print(f"Error processing {file_path.name}: {str(e)}")
+                continue
+            replaced |= manifest.replace_file(key, stat, records)
+            stats["reused"] += reused
+            stats["extracted"] += extracted
+            print(f"Processed {file_path.name} - Found {summarize_records(records)}")
+        
+        replaced |= manifest.remove_files(manifest.file_keys() - seen)
+        deleted = len(manifest.missing_unids(replaced))
+        print(f"Incremental extraction: {stats['unchanged_files']} unchanged files skipped, "
+              f"{stats['extracted']} documents extracted, {stats['reused']} reused, {deleted} deleted")
+        
+        all_results = {family: {} for family in families}
+        for key, records in manifest.iter_files():
+            merge_file_records(all_results, folder / key, records)
     return all_results
 
+def process_dxl_files(folder_path):
+    """
+    Process all DXL files in the specified folder.
+    
+    Args:
+        folder_path: Path to the folder containing DXL files
+    
+    Returns:
+        Dictionary with file names as keys and extracted items as values
+    """
+    return process_dxl_folder(folder_path, ("Field_Tx_6",))["Field_Tx_6"]
+
 def save_results_to_file(results, output_file="field_tx_6_results.txt"):
     """
     Save the extracted results to a text file.
@@ -124,23 +775,7 @@ def extract_deterioration_tx_items(file_path):
     Returns:
         Dictionary with item names as keys and their text content as values
     """
-    # Read the file content
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Since DXL files might not be well-formed XML, use regex to extract items
-    pattern = r'<item\s+name=[\'"]Deterioration_Tx_(\d+)[\'"]>\s*<text>(.*?)</text>\s*</item>'
-    matches = re.findall(pattern, content, re.DOTALL)
-    
-    results = {}
-    for number, text in matches:
-        item_name = f'Deterioration_Tx_{number}'
-        # Clean up the text - replace <break/> with newlines and remove extra whitespace
-        clean_text = re.sub(r'<break\s*/>', '\n', text)
-        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-        results[item_name] = clean_text
-    
-    return results
+    return extract_items(file_path, ("Deterioration_Tx",))["Deterioration_Tx"]
 
 def process_deterioration_files(folder_path):
     """
@@ -152,79 +787,82 @@ def process_deterioration_files(folder_path):
     Returns:
         Dictionary with file names as keys and extracted items as values
     """
-    folder = Path(folder_path)
-    
-    # Check if folder exists
-    if not folder.exists() or not folder.is_dir():
-        raise ValueError(f"Folder not found: {folder_path}")
-    
-    all_results = {}
-    
-    # Find all .dxl files in the folder
-    dxl_files = list(folder.glob('**/*.dxl'))
+    return process_dxl_folder(folder_path, ("Deterioration_Tx",))["Deterioration_Tx"]
+
+def save_family_results(family, results):
+    """
+    Save detailed and unique-value outputs for one item family.
     
-    if not dxl_files:
-        print(f"No .dxl files found in {folder_path}")
-        return all_results
+    Args:
+        family: Item-name family, e.g. 'Field_Tx_6'
+        results: Dictionary with file names and extracted items for the family
+    """
+    # Print summary
+    total_items = sum(len(items) for items in results.values())
+    print(f"\nFound {total_items} {family} items in {len(results)} files.")
     
-    # Process each file
-    for file_path in dxl_files:
-        try:
-            results = extract_deterioration_tx_items(file_path)
-            if results:
-                all_results[file_path.name] = results
-            print(f"Processed {file_path.name} - Found {len(results)} Deterioration_Tx items")
-        except Exception as e:
-            print(f"Error processing {file_path.name}: {str(e)}")
+    # Save detailed results to file
+    output_file = f"{family.lower()}_results.txt"
+    save_results_to_file(results, output_file)
+    print(f"Detailed {family} results saved to {output_file}")
     
-    return all_results
+    # Extract and save unique values
+    unique_values = extract_unique_text_values(results)
+    unique_output_file = f"unique_{family.lower()}_values.txt"
+    save_unique_values_to_file(unique_values, unique_output_file)
+    print(f"Found {len(unique_values)} unique {family} text values")
+    print(f"Unique {family} values saved to {unique_output_file}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract text items from DXL files")
+    parser.add_argument("folder", nargs="?", default="RBI_sample",
+                        help="Folder containing DXL files")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes (0 for one per CPU)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Scan memory-mapped bytes, decoding only matched text")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-extract documents that changed since the last run")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_FILE,
+                        help="Manifest file used by --incremental")
+    parser.add_argument("--sqlite", help="Stream extracted items into this SQLite database")
+    parser.add_argument("--jsonl", help="Stream extracted items into this JSON Lines file")
+    args = parser.parse_args()
+    
     # Set the folder path containing DXL files
-    folder_path = "RBI_sample"
+    folder_path = args.folder
     
     try:
-        # Process the DXL files for Field_Tx_6 items
-        field_results = process_dxl_files(folder_path)
-        
-        if field_results:
-            # Print summary for Field_Tx_6
-            total_field_items = sum(len(items) for items in field_results.values())
-            print(f"\nFound {total_field_items} Field_Tx_6 items in {len(field_results)} files.")
-            
-            # Save detailed results to file
-            field_output_file = "field_tx_6_results.txt"
-            save_results_to_file(field_results, field_output_file)
-            print(f"Detailed Field_Tx_6 results saved to {field_output_file}")
-            
-            # Extract and save unique values for Field_Tx_6
-            field_unique_values = extract_unique_text_values(field_results)
-            field_unique_output_file = "unique_field_tx_6_values.txt"
-            save_unique_values_to_file(field_unique_values, field_unique_output_file)
-            print(f"Found {len(field_unique_values)} unique Field_Tx_6 text values")
-            print(f"Unique Field_Tx_6 values saved to {field_unique_output_file}")
+        if args.sqlite or args.jsonl:
+            # Stream structured records instead of building the text reports
+            sinks = []
+            if args.sqlite:
+                sinks.append(SqliteSink(args.sqlite))
+            if args.jsonl:
+                sinks.append(JsonlSink(args.jsonl))
+            try:
+                documents = export_dxl_folder(folder_path, sinks, ITEM_FAMILIES)
+            finally:
+                for sink in sinks:
+                    sink.close()
+            for sink in sinks:
+                print(f"Wrote {sink.count} items from {documents} documents to {sink.path}")
+            return
         
-        # Process the DXL files for Deterioration_Tx items
-        deterioration_results = process_deterioration_files(folder_path)
+        # Process the DXL files once for every item family
+        if args.incremental:
+            all_results = process_dxl_folder_incremental(folder_path, ITEM_FAMILIES, args.manifest)
+        elif args.workers == 1:
+            all_results = process_dxl_folder(folder_path, ITEM_FAMILIES, use_mmap=args.mmap)
+        else:
+            all_results = process_dxl_folder_parallel(folder_path, ITEM_FAMILIES, workers=args.workers or None,
+                                                      use_mmap=args.mmap)
         
-        if deterioration_results:
-            # Print summary for Deterioration_Tx
-            total_deterioration_items = sum(len(items) for items in deterioration_results.values())
-            print(f"\nFound {total_deterioration_items} Deterioration_Tx items in {len(deterioration_results)} files.")
-            
-            # Save detailed results to file
-            deterioration_output_file = "deterioration_tx_results.txt"
-            save_results_to_file(deterioration_results, deterioration_output_file)
-            print(f"Detailed Deterioration_Tx results saved to {deterioration_output_file}")
-            
-            # Extract and save unique values for Deterioration_Tx
-            deterioration_unique_values = extract_unique_text_values(deterioration_results)
-            deterioration_unique_output_file = "unique_deterioration_tx_values.txt"
-            save_unique_values_to_file(deterioration_unique_values, deterioration_unique_output_file)
-            print(f"Found {len(deterioration_unique_values)} unique Deterioration_Tx text values")
-            print(f"Unique Deterioration_Tx values saved to {deterioration_unique_output_file}")
+        for family, results in all_results.items():
+            if results:
+                save_family_results(family, results)
         
-        if not field_results and not deterioration_results:
+        if not any(all_results.values()):
             print("No items found in any files.")
             
     except Exception as e:
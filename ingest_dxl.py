@@ -0,0 +1,213 @@
+import argparse
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from field_extraction import (
+    ITEM_FAMILIES, find_dxl_files, iter_document_records, iter_document_records_mmap
+)
+from search_index import SEARCH_FAMILIES, SearchIndex
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection settings
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = "inspection"
+RECORDS_COLLECTION = "rbi_records"
+
+# Default number of documents per bulk_write and batches allowed to queue up
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_PENDING_BATCHES = 4
+
+# Marks the end of the extracted batches on the queue
+END_OF_BATCHES = None
+
+# How often a blocked producer checks whether the writer has stopped
+QUEUE_POLL_SECONDS = 0.1
+
+def iter_record_batches(folder_path, families=ITEM_FAMILIES, batch_size=DEFAULT_BATCH_SIZE, use_mmap=False):
+    """
+    Stream extracted DXL document records from a folder in fixed-size batches.
+
+    Args:
+        folder_path: Path to the folder containing DXL files
+        families: Iterable of item-name families to extract
+        batch_size: Number of records per batch
+        use_mmap: Scan memory-mapped bytes instead of decoded text
+
+    Yields:
+        Lists of document records, each tagged with its source file name
+    """
+    folder = Path(folder_path)
+
+    # Check if folder exists
+    if not folder.exists() or not folder.is_dir():
+        raise ValueError(f"Folder not found: {folder_path}")
+
+    batch = []
+    for file_path in find_dxl_files(folder):
+        try:
+            records = iter_document_records_mmap if use_mmap else iter_document_records
+            for record in records(file_path, families):
+                if not record["unid"]:
+                    print(f"Skipping document without UNID in {file_path.name}")
+                    continue
+                record["file"] = file_path.name
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        except Exception as e:
+            print(f"Error processing {file_path.name}: {str(e)}")
+    if batch:
+        yield batch
+
+def collapse_by_unid(records):
+    """
+    Keep only the last record for each UNID in a batch.
+
+    Unordered upserts of the same UNID in one bulk_write can race on the unique
+    index (E11000), and the last copy is the one a sequential write would keep.
+    """
+    return list({record["unid"]: record for record in records}.values())
+
+def build_upserts(records):
+    """
+    Build one UNID-keyed upsert per document record.
+    """
+    return [
+        UpdateOne({"unid": record["unid"]}, {"$set": record}, upsert=True)
+        for record in records
+    ]
+
+def ingest_dxl_folder(folder_path, batch_size=DEFAULT_BATCH_SIZE, max_pending=DEFAULT_MAX_PENDING_BATCHES,
+                      collection_name=RECORDS_COLLECTION, families=ITEM_FAMILIES, use_mmap=False,
+                      search_index_path=None):
+    """
+    Stream extracted DXL documents into MongoDB with batched, unordered upserts.
+
+    Extraction runs on a background thread and hands batches to the writer through
+    a bounded queue, so parsing overlaps with database round trips; when MongoDB
+    falls behind, the queue fills and extraction pauses instead of buffering the
+    whole corpus in memory.
+
+    Args:
+        folder_path: Path to the folder containing DXL files
+        batch_size: Number of documents per bulk_write
+        max_pending: Maximum number of extracted batches waiting to be written
+        collection_name: Target collection in the inspection database
+        families: Iterable of item-name families to extract
+        use_mmap: Scan memory-mapped bytes instead of decoded text
+        search_index_path: Search index snapshot to update with the ingested
+            documents (created if missing), or None
+
+    Returns:
+        Dictionary with 'batches', 'documents', 'upserted', 'modified' and 'seconds'
+    """
+    index = None
+    if search_index_path:
+        families = tuple(dict.fromkeys(tuple(families) + SEARCH_FAMILIES))
+        index = SearchIndex.load(search_index_path) if os.path.exists(search_index_path) else SearchIndex()
+
+    client = MongoClient(MONGO_URI)
+    try:
+        collection = client[DB_NAME][collection_name]
+        collection.create_index("unid", unique=True)
+
+        pending = queue.Queue(maxsize=max_pending)
+        errors = []
+        stopped = threading.Event()
+
+        def offer(item):
+            # Give up once the writer has stopped, so a failed write never leaves this thread blocked
+            while not stopped.is_set():
+                try:
+                    pending.put(item, timeout=QUEUE_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for batch in iter_record_batches(folder_path, families, batch_size, use_mmap):
+                    if not offer(batch):
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                offer(END_OF_BATCHES)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        started = time.perf_counter()
+        producer.start()
+
+        stats = {"batches": 0, "documents": 0, "upserted": 0, "modified": 0}
+        try:
+            while True:
+                batch = pending.get()
+                if batch is END_OF_BATCHES:
+                    break
+                batch = collapse_by_unid(batch)
+                batch_started = time.perf_counter()
+                result = collection.bulk_write(build_upserts(batch), ordered=False)
+                elapsed = time.perf_counter() - batch_started
+
+                if index is not None:
+                    index.add_records(batch)
+
+                stats["batches"] += 1
+                stats["documents"] += len(batch)
+                stats["upserted"] += result.upserted_count
+                stats["modified"] += result.modified_count
+                print(f"Batch {stats['batches']}: {len(batch)} documents in {elapsed:.3f}s "
+                      f"({len(batch) / elapsed:.0f} docs/s, {result.upserted_count} new, "
+                      f"{result.modified_count} updated, {pending.qsize()} batches queued)")
+        finally:
+            # On a write error, release the producer and the batches it holds
+            stopped.set()
+            producer.join()
+        if errors:
+            raise errors[0]
+
+        if index is not None:
+            index.save(search_index_path)
+            print(f"Search index updated: {index.stats()['documents']} documents -> {search_index_path}")
+
+        stats["seconds"] = time.perf_counter() - started
+        print(f"Ingested {stats['documents']} documents in {stats['batches']} batches "
+              f"in {stats['seconds']:.1f}s")
+        return stats
+    finally:
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Load extracted DXL documents into MongoDB")
+    parser.add_argument("folder", nargs="?", default="RBI_sample",
+                        help="Folder containing DXL files")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Documents per bulk_write")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING_BATCHES,
+                        help="Extracted batches allowed to wait for the writer")
+    parser.add_argument("--collection", default=RECORDS_COLLECTION,
+                        help="Target collection")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Scan memory-mapped bytes, decoding only matched text")
+    parser.add_argument("--search-index", metavar="PATH",
+                        help="Also apply the ingested documents to this search index snapshot")
+    args = parser.parse_args()
+
+    try:
+        ingest_dxl_folder(args.folder, args.batch_size, args.max_pending, args.collection, use_mmap=args.mmap,
+                          search_index_path=args.search_index)
+    except Exception as e:
+        print(f"Error ingesting DXL documents: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ReplaceOne, DeleteMany
 from initial_data import EQUIPMENT_DATA, FLUIDS_DATA, DETERIORATION_DATA
+from analysis_cache import RELEVANCE_CACHE_COLLECTION, bump_catalog_version
 import os
 from dotenv import load_dotenv
 
@@ -105,7 +106,68 @@ FAILURE_SCENARIOS_DATA = [
     }
 ]
 
-def init_database(collection_name: str = None):
+def swap_collection(db, name, data):
+    """
+    Load data into a staging collection and atomically swap it in with renameCollection.
+    
+    Readers see either the old or the new collection, never an empty or partial one,
+    and the unique 'id' index is built on the staging copy before the swap.
+    """
+    staging = db[f"{name}_staging"]
+    staging.drop()
+    if data:
+        # insert_many adds '_id' to the documents it is given, so pass copies
+        staging.insert_many([dict(doc) for doc in data])
+    staging.create_index("id", unique=True)
+    
+    count = staging.count_documents({})
+    if count != len(data):
+        staging.drop()
+        raise RuntimeError(f"Staging {name} has {count} documents, expected {len(data)}")
+    
+    staging.rename(name, dropTarget=True)
+    print(f"Swapped in {count} {name} items")
+
+def diff_collection(db, name, data):
+    """
+    Upsert only the documents that changed and delete the ones no longer in data.
+    """
+    collection = db[name]
+    collection.create_index("id", unique=True)
+    existing = {doc.get("id"): doc for doc in collection.find({}, {'_id': 0})}
+    
+    operations = [
+        ReplaceOne({"id": doc["id"]}, dict(doc), upsert=True)
+        for doc in data
+        if existing.get(doc["id"]) != doc
+    ]
+    ids = {doc["id"] for doc in data}
+    removed = [doc_id for doc_id in existing if doc_id not in ids]
+    if removed:
+        operations.append(DeleteMany({"id": {"$in": removed}}))
+    
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+    print(f"Updated {len(operations) - (1 if removed else 0)} and removed {len(removed)} {name} items")
+
+def replace_collection(db, name, data):
+    """
+    Drop and reinsert a collection. Leaves it empty while reloading.
+    """
+    db[name].drop()
+    if data:
+        db[name].insert_many([dict(doc) for doc in data])
+        print(f"Inserted {len(data)} {name} items")
+    db[name].create_index("id", unique=True)
+
+# Reload modes supported by init_database
+RELOAD_MODES = {
+    'swap': swap_collection,
+    'diff': diff_collection,
+    'replace': replace_collection
+}
+
+def init_database(collection_name: str = None, mode: str = "swap"):
     """
     Initialize the MongoDB database with equipment, fluids, deterioration, and failure scenarios data.
     
@@ -113,6 +175,9 @@ def init_database(collection_name: str = None):
         collection_name (str, optional): Name of the collection to initialize. 
             If None, all collections will be initialized.
             Valid values: 'equipment', 'fluids', 'deterioration', 'failure_scenarios'
+        mode (str, optional): How to reload each collection.
+            'swap' builds a staging collection and renames it over the live one,
+            'diff' upserts only changed documents, and 'replace' drops and reinserts.
     """
     try:
         # Connect to MongoDB
@@ -127,25 +192,28 @@ def init_database(collection_name: str = None):
             'failure_scenarios': FAILURE_SCENARIOS_DATA
         }
         
+        if mode not in RELOAD_MODES:
+            raise ValueError(f"Invalid reload mode. Must be one of: {', '.join(RELOAD_MODES)}")
+        reload_collection = RELOAD_MODES[mode]
+        
         if collection_name:
             if collection_name not in collections:
                 raise ValueError(f"Invalid collection name. Must be one of: {', '.join(collections.keys())}")
             
             # Initialize only the specified collection
-            data = collections[collection_name]
-            db[collection_name].drop()
-            if data:
-                db[collection_name].insert_many(data)
-                print(f"Inserted {len(data)} {collection_name} items")
-            db[collection_name].create_index("id", unique=True)
+            reload_collection(db, collection_name, collections[collection_name])
         else:
             # Initialize all collections
             for name, data in collections.items():
-                db[name].drop()
-                if data:
-                    db[name].insert_many(data)
-                    print(f"Inserted {len(data)} {name} items")
-                db[name].create_index("id", unique=True)
+                reload_collection(db, name, data)
+        
+        # Cached analyses were computed from the collections just reloaded
+        reloaded = [collection_name] if collection_name else list(collections)
+        for name in reloaded:
+            bump_catalog_version(db, name)
+        if set(reloaded) & {'equipment', 'fluids', 'deterioration'}:
+            result = db[RELEVANCE_CACHE_COLLECTION].delete_many({})
+            print(f"Invalidated {result.deleted_count} cached relevance verdicts")
         
         print("Database initialization completed successfully!")
         
@@ -1,12 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any
-from pymongo import MongoClient
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Dict, Any, Tuple
+import asyncio
 import os
 import json
-from openai import OpenAI
 from dotenv import load_dotenv
 import re
+from db_access import AsyncDatabase, create_mongo_client
+from llm_client import LLMClient, cancel_on_disconnect
+from relevance_matrix import (
+    MATRIX_VERSION, fetch_rows, lookup_relevance, merge_row, row_verdicts, store_cells, store_rows
+)
+from prefilter_rules import prefilter_mechanisms
+from prompts import (
+    PROMPT_TOKEN_BUDGET, batch_fixed_tokens, build_batch_relevance_messages, build_failure_prompts,
+    build_relevance_prompts, estimate_tokens, format_batch_pair, parse_verdicts
+)
+from single_flight import SingleFlight
+from precedent_index import PRECEDENT_INDEX_PATH, PrecedentIndex, vote_mechanisms
+from search_index import SEARCH_INDEX_PATH, SearchIndex
+from scenario_model import SCENARIO_MODEL_PATH, ScenarioModel
+from analysis_cache import (
+    AnalysisCache, CatalogVersions, LRUCache, fingerprint, FAILURE_SCENARIO_CACHE_MAX_ENTRIES
+)
 
 # Load environment variables
 load_dotenv()
@@ -26,47 +44,91 @@ app.add_middleware(
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "inspection"
 
-# Initialize OpenAI client with OpenRouter
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
+# Initialize async LLM client with OpenRouter
+llm = LLMClient(api_key=os.getenv("OPENROUTER_API_KEY"))
+
+# Cap on equipment/fluid pairs packed into one batch relevance prompt
+BATCH_MAX_PAIRS_PER_PROMPT = int(os.getenv("BATCH_MAX_PAIRS_PER_PROMPT", "20"))
+
+# One verdict line per pair in a batch response, e.g. "P3: TFFT"
+BATCH_VERDICT_PATTERN = re.compile(r"^\s*P(\d+)\s*[:\-]\s*([TtFf][TtFf\s,]*)$", re.MULTILINE)
+
+# MongoDB access layer instance
+database = None
+
+# Deterioration relevance verdict cache
+relevance_cache = None
+
+# Failure scenario results keyed by deterioration ID set and catalog versions
+failure_scenario_cache = LRUCache(FAILURE_SCENARIO_CACHE_MAX_ENTRIES)
+catalog_versions = None
+
+# Coalesces concurrent identical analyses into one in-flight computation
+analysis_flights = SingleFlight()
+
+# Similarity index over historical assessments, built offline by precedent_index.py
+precedent_index = None
 
-# MongoDB client instance
-mongo_client = None
+# Deterioration -> failure scenario associations, built offline by scenario_model.py
+scenario_model = None
+
+# BM25 index over extracted assessment text, reloaded when its snapshot changes
+search_index = None
+search_index_mtime = None
+search_index_checked = 0.0
+SEARCH_INDEX_CHECK_SECONDS = float(os.getenv("SEARCH_INDEX_CHECK_SECONDS", "30"))
 
 @app.on_event("startup")
 async def startup_db_client():
     """
     Initialize database connection on startup
     """
-    global mongo_client
+    global database, relevance_cache, catalog_versions, precedent_index, scenario_model
     try:
-        mongo_client = MongoClient(MONGO_URI)
+        database = AsyncDatabase(create_mongo_client(MONGO_URI), DB_NAME)
         # Verify the connection
-        mongo_client.admin.command('ping')
+        await database.ping()
         print("Successfully connected to MongoDB!")
+        relevance_cache = AnalysisCache(database)
+        await relevance_cache.ensure_indexes()
+        catalog_versions = CatalogVersions(database)
     except Exception as e:
         print(f"Error connecting to MongoDB: {str(e)}")
         raise
+    
+    try:
+        precedent_index = PrecedentIndex.load(PRECEDENT_INDEX_PATH)
+        print(f"Loaded precedent index with {len(precedent_index.records)} assessments")
+    except FileNotFoundError:
+        print(f"No precedent index at {PRECEDENT_INDEX_PATH}; /precedents is unavailable")
+    
+    try:
+        scenario_model = ScenarioModel.load(SCENARIO_MODEL_PATH)
+        print(f"Loaded scenario model from {scenario_model.documents} assessments")
+    except FileNotFoundError:
+        print(f"No scenario model at {SCENARIO_MODEL_PATH}; failure scenarios use the LLM only")
+    
+    if not await refresh_search_index(force=True):
+        print(f"No search index at {SEARCH_INDEX_PATH}; /search is unavailable")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """
     Close database connection on shutdown
     """
-    global mongo_client
-    if mongo_client:
-        mongo_client.close()
+    global database
+    if database:
+        database.close()
         print("MongoDB connection closed.")
+    await llm.aclose()
 
-def get_db():
+def get_db() -> AsyncDatabase:
     """
     Get database instance
     """
-    if not mongo_client:
+    if not database:
         raise HTTPException(status_code=500, detail="Database connection not initialized")
-    return mongo_client[DB_NAME]
+    return database
 
 @app.get("/equipment", response_model=Dict[str, List[Dict[str, Any]]])
 async def get_equipment():
@@ -75,7 +137,7 @@ async def get_equipment():
     """
     try:
         db = get_db()
-        equipment_list = list(db.equipment.find({}, {'_id': 0}))
+        equipment_list = await db.find("equipment", {}, {'_id': 0})
         return {"equipment": equipment_list}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching equipment data: {str(e)}")
@@ -87,230 +149,647 @@ async def get_fluids():
     """
     try:
         db = get_db()
-        fluids_list = list(db.fluids.find({}, {'_id': 0}))
+        fluids_list = await db.find("fluids", {}, {'_id': 0})
         return {"fluids": fluids_list}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching fluids data: {str(e)}")
 
-async def analyze_deterioration_relevance(equipment: Dict, fluid: Dict, mechanisms: List[Dict]) -> Dict[str, List[str]]:
+async def request_deterioration_relevance(equipment: Dict, fluid: Dict, mechanisms: List[Dict],
+                                          catalog: List[Dict] = None) -> Dict[str, List[str]]:
     """
     Use OpenRouter API to analyze which deterioration mechanisms are relevant for given equipment and fluid.
+    Raises on LLM errors so failed analyses are never cached.
+    
+    Args:
+        equipment: Equipment document
+        fluid: Fluid document
+        mechanisms: Mechanisms to decide
+        catalog: Full mechanism catalog for the cached prompt prefix (defaults to mechanisms)
+    
+    Returns:
+        Dictionary with 'relevant_ids' and 'verdicts' ({mechanism ID: relevant}); mechanisms
+        the response gave no parseable verdict for are absent from 'verdicts'
     """
-    # Format all mechanisms into a single string
-    mechanisms_str = "\n\n".join([
-        f"id: {m.get('id', 'N/A')}\n"
-        f"Mechanism {i+1}:\n"
-        f"- Name: {m.get('name', 'N/A')}\n"
-        f"- Description: {m.get('description', 'N/A')}\n"
-        f"- Affected Areas: {', '.join(m.get('affectedAreas', []))}\n"
-        f"- Contributing Factors: {', '.join(m.get('contributingFactors', []))}"
-        for i, m in enumerate(mechanisms)
-    ])
-    print("mechanisms_str", mechanisms_str)
-    print("equipment", equipment)
-    print("fluid", fluid)
-    prompt = f"""
-    Analyze which of the following deterioration mechanisms are relevant for the given equipment and fluid.
-    Each line of the response should have true or false and nothing else corresponding to whether a mechanism is relevant.
-
-    Equipment:
-    - Type: {equipment.get('type', 'N/A')}
-    - Material: {equipment.get('material', 'N/A')}
-    - Operating Temperature: {equipment.get('operatingTemperature', 'N/A')}°C
-    - Operating Pressure: {equipment.get('operatingPressure', 'N/A')} bar
-    - Design Temperature: {equipment.get('designTemperature', 'N/A')}°C
-    - Design Pressure: {equipment.get('designPressure', 'N/A')} bar
-
-    Fluid:
-    - Name: {fluid.get('name', 'N/A')}
-    - Type: {fluid.get('type', 'N/A')}
-    - pH: {fluid.get('pH', 'N/A')}
-    - Temperature: {fluid.get('temperature', 'N/A')}°C
-    - Pressure: {fluid.get('pressure', 'N/A')} bar
-
-    Deterioration Mechanisms:
-    {mechanisms_str}
-    """
-    print("asking LLM")
+    prompts = build_relevance_prompts(equipment, fluid, catalog or mechanisms, mechanisms)
+    responses = await asyncio.gather(*(
+        llm.complete(messages=messages, temperature=0.1, label="deterioration relevance")
+        for _, messages, _ in prompts
+    ))
+    
+    verdicts = {}
+    for (_, _, codes), response_text in zip(prompts, responses):
+        verdicts.update(parse_verdicts(response_text, codes))
+    return {
+        "relevant_ids": [m["id"] for m in mechanisms if verdicts.get(m["id"])],
+        "verdicts": {m["id"]: verdicts[m["id"]] for m in mechanisms if m["id"] in verdicts}
+    }
 
+def relevance_cache_key(equipment: Dict, fluid: Dict, mechanisms: List[Dict]) -> str:
+    """
+    Cache key for a relevance verdict: the pair's IDs plus a hash of everything the
+    prompt is built from, so edits to the catalog or the prompt start a fresh entry.
+    """
+    equipment_id = equipment.get('id') if equipment else None
+    fluid_id = fluid.get('id') if fluid else None
+    digest = fingerprint(MATRIX_VERSION, equipment, fluid, mechanisms)
+    return f"{equipment_id}|{fluid_id}|{digest}"
+
+async def analyze_deterioration_relevance(equipment: Dict, fluid: Dict, mechanisms: List[Dict]) -> Dict[str, List[str]]:
+    """
+    Return the relevant deterioration mechanisms for an equipment/fluid pair,
+    serving repeated questions from the relevance cache. Answers missing a
+    verdict for any mechanism are not cached.
+    """
+    key = relevance_cache_key(equipment, fluid, mechanisms)
+    if relevance_cache:
+        cached = await relevance_cache.get(key)
+        if cached is not None:
+            return cached
+    
     try:
-        response = client.chat.completions.create(
-            model="meta-llama/llama-3.3-70b-instruct:free",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an expert in materials science and corrosion engineering. 
-                    Analyze which deterioration mechanisms are relevant for the given equipment and fluid combination. 
-                    Consider all factors including material compatibility, operating conditions, and environmental factors.
-                    Each line true or false for each mechanism and nothing else.
-                    only return the list and nothing else"""
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.1,
-            response_format={ "type": "json_object" }
-        )
-        # print(response)
-        x = response.choices[0].message.content
-        # [response.choices[0].message.content.find('{'):response.choices[0].message.content.rfind('}')+1]
-        # remove all character's imbetween each } and {
-        # Parse the response
-        print(x)
-        relevant_ids = []
-        # Filter and return only relevant mechanisms
-        for i, line in enumerate(x.split("\n")):
-            
-            if i < len(mechanisms) and "true" in line.strip():
-                relevant_ids.append(mechanisms[i]["id"])
-        print(relevant_ids)
-        return {"relevant_ids": relevant_ids}
-        
+        result = await request_deterioration_relevance(equipment, fluid, mechanisms)
     except Exception as e:
         print(f"Error in LLM analysis: {str(e)}")
         return {"relevant_ids": []}
+    
+    answer = {"relevant_ids": result["relevant_ids"]}
+    if relevance_cache and len(result["verdicts"]) == len(mechanisms):
+        await relevance_cache.set(key, answer)
+    return answer
+
+async def analyze_relevance_cells(equipment: Dict, fluid: Dict, mechanisms: List[Dict],
+                                  catalog: List[Dict] = None) -> Dict[str, Any]:
+    """
+    Decide a pair's mechanisms with the rule prefilter, asking the LLM only about
+    the ones the rules leave ambiguous. Raises on LLM errors.
+    
+    Returns:
+        Dictionary with 'relevant_ids' and 'verdicts' ({mechanism ID: relevant} for
+        every mechanism that got an explicit answer)
+    """
+    verdicts, ambiguous = prefilter_mechanisms(equipment, fluid, mechanisms)
+    if ambiguous:
+        live = await request_deterioration_relevance(equipment, fluid, ambiguous, catalog or mechanisms)
+        verdicts.update(live["verdicts"])
+    return {"relevant_ids": [m["id"] for m in mechanisms if verdicts.get(m["id"])], "verdicts": verdicts}
+
+async def resolve_deterioration_relevance(equipment: Dict, fluid: Dict, mechanisms: List[Dict]) -> Dict[str, List[str]]:
+    """
+    Serve a pair's relevant mechanisms from the precomputed relevance matrix,
+    deciding only the cells that are missing or out of date (by rule where
+    clear-cut, otherwise by the LLM) and storing them back into the matrix.
+    
+    The relevance cache sits in front of the matrix, so a repeated pair is
+    answered from memory. Mechanisms the LLM gave no verdict for are neither
+    stored nor cached, so the next request asks about them again.
+    """
+    if not equipment or not fluid:
+        return await analyze_deterioration_relevance(equipment, fluid, mechanisms)
+    
+    key = relevance_cache_key(equipment, fluid, mechanisms)
+    if relevance_cache:
+        cached = await relevance_cache.get(key)
+        if cached is not None:
+            return cached
+    
+    db = get_db()
+    relevant_ids, missing = await lookup_relevance(db, equipment, fluid, mechanisms)
+    if missing:
+        try:
+            live = await analyze_relevance_cells(equipment, fluid, missing, mechanisms)
+        except Exception as e:
+            print(f"Error in LLM analysis: {str(e)}")
+            return {"relevant_ids": relevant_ids}
+        await store_cells(db, equipment, fluid, mechanisms, live["verdicts"])
+        relevant = set(relevant_ids) | set(live["relevant_ids"])
+        relevant_ids = [m["id"] for m in mechanisms if m["id"] in relevant]
+        complete = len(live["verdicts"]) == len(missing)
+    else:
+        complete = True
+    
+    result = {"relevant_ids": relevant_ids}
+    if relevance_cache and complete:
+        await relevance_cache.set(key, result)
+    return result
+
+async def compute_deterioration(equipment_id: str, fluid_id: str) -> List[Dict[str, Any]]:
+    """
+    Load the equipment, fluid and mechanisms and return the relevant mechanism documents.
+    """
+    db = get_db()
+    deterioration_list = await db.find("deterioration", {}, {'_id': 0})
+    
+    # Get equipment and fluid data if IDs are provided
+    equipment = None
+    fluid = None
+    
+    if equipment_id:
+        equipment = await db.find_one("equipment", {"id": equipment_id}, {'_id': 0})
+        if not equipment:
+            raise HTTPException(status_code=404, detail=f"Equipment with ID {equipment_id} not found")
+    
+    if fluid_id:
+        fluid = await db.find_one("fluids", {"id": fluid_id}, {'_id': 0})
+        if not fluid:
+            raise HTTPException(status_code=404, detail=f"Fluid with ID {fluid_id} not found")
+    
+    # Get relevant mechanisms from the matrix, with a single LLM call for any missing cells
+    result = await resolve_deterioration_relevance(equipment, fluid, deterioration_list)
+    relevant_ids = set(result["relevant_ids"])
+    return [d for d in deterioration_list if d["id"] in relevant_ids]
 
 @app.get("/deterioration", response_model=Dict[str, List[Dict[str, Any]]])
-async def get_deterioration(equipment_id: str = None, fluid_id: str = None):
+async def get_deterioration(request: Request, equipment_id: str = None, fluid_id: str = None):
     """
     Returns a list of relevant deterioration types based on equipment and fluid properties.
-    Uses LLM to determine relevance.
+    Served from the precomputed relevance matrix, using the LLM only for missing cells.
+    Concurrent identical requests share one computation.
     """
     try:
-        db = get_db()
-        deterioration_list = list(db.deterioration.find({}, {'_id': 0}))
-        
         if not equipment_id and not fluid_id:
+            db = get_db()
+            deterioration_list = await db.find("deterioration", {}, {'_id': 0})
             return {"deterioration": deterioration_list}
         
-        # Get equipment and fluid data if IDs are provided
-        equipment = None
-        fluid = None
-        
-        if equipment_id:
-            equipment = db.equipment.find_one({"id": equipment_id}, {'_id': 0})
-            if not equipment:
-                raise HTTPException(status_code=404, detail=f"Equipment with ID {equipment_id} not found")
-        
-        if fluid_id:
-            fluid = db.fluids.find_one({"id": fluid_id}, {'_id': 0})
-            if not fluid:
-                raise HTTPException(status_code=404, detail=f"Fluid with ID {fluid_id} not found")
-        
-        # Get relevant mechanisms in a single LLM call
-        relevant_deterioration = await analyze_deterioration_relevance(equipment, fluid, deterioration_list)
+        relevant_deterioration = await cancel_on_disconnect(
+            request,
+            analysis_flights.do(
+                ("deterioration", equipment_id, fluid_id),
+                lambda: compute_deterioration(equipment_id, fluid_id)
+            )
+        )
         
         return {"deterioration": relevant_deterioration}
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=f"Error fetching deterioration data: {str(e)}")
 
-async def analyze_failure_scenarios(deterioration_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+def sse_event(event: str, data: Dict[str, Any]) -> str:
     """
-    Use OpenRouter API to analyze which failure scenarios are relevant for given deterioration mechanisms.
+    Format one Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_deterioration_verdicts(equipment: Dict, fluid: Dict, mechanisms: List[Dict]):
+    """
+    Yield an SSE 'verdict' event per mechanism for a pair as soon as it is known,
+    then a 'done' event with the relevant IDs.
+    
+    Verdicts from the relevance matrix and the rule prefilter are sent before the
+    LLM is called; the rest are sent line by line from a streamed completion and
+    stored into the matrix once it finishes. Mechanisms the completion gave no
+    verdict for get an 'undecided' event and are not stored, so a later request
+    asks again. An LLM failure ends the stream with an 'error' event and nothing
+    is stored.
+    """
+    db = get_db()
+    relevant_ids, missing = await lookup_relevance(db, equipment, fluid, mechanisms)
+    relevant = set(relevant_ids)
+    missing_ids = {m["id"] for m in missing}
+    for m in mechanisms:
+        if m["id"] not in missing_ids:
+            yield sse_event("verdict", {"id": m["id"], "relevant": m["id"] in relevant, "source": "matrix"})
+    
+    rule_verdicts, ambiguous = prefilter_mechanisms(equipment, fluid, missing)
+    relevant.update(id for id, verdict in rule_verdicts.items() if verdict)
+    ambiguous_ids = {m["id"] for m in ambiguous}
+    for m in missing:
+        if m["id"] not in ambiguous_ids:
+            yield sse_event("verdict", {"id": m["id"], "relevant": m["id"] in relevant, "source": "rules"})
+    
+    decided = {}
+    def llm_verdicts(text, codes):
+        events = []
+        for id, verdict in parse_verdicts(text, codes).items():
+            if id in ambiguous_ids and id not in decided:
+                decided[id] = verdict
+                if verdict:
+                    relevant.add(id)
+                events.append(sse_event("verdict", {"id": id, "relevant": verdict, "source": "llm"}))
+        return events
+    
+    try:
+        for _, messages, codes in build_relevance_prompts(equipment, fluid, mechanisms, ambiguous):
+            buffer = ""
+            async for content in llm.stream(messages, temperature=0.1, label="deterioration relevance stream"):
+                # Only complete lines are parsed so a verdict is never read from a partial token
+                *lines, buffer = (buffer + content).split("\n")
+                for event in llm_verdicts("\n".join(lines), codes):
+                    yield event
+            for event in llm_verdicts(buffer, codes):
+                yield event
+    except Exception as e:
+        print(f"Error in streamed LLM analysis: {str(e)}")
+        yield sse_event("error", {"detail": f"Error analyzing deterioration: {str(e)}"})
+        return
+    
+    for m in ambiguous:
+        if m["id"] not in decided:
+            yield sse_event("undecided", {"id": m["id"]})
+    if rule_verdicts or decided:
+        await store_cells(db, equipment, fluid, mechanisms, {**rule_verdicts, **decided})
+    yield sse_event("done", {"relevant_ids": [m["id"] for m in mechanisms if m["id"] in relevant]})
+
+@app.get("/deterioration/stream")
+async def stream_deterioration(equipment_id: str, fluid_id: str):
+    """
+    Streams which deterioration mechanisms are relevant for an equipment/fluid pair
+    as Server-Sent Events, sending known verdicts immediately and LLM verdicts as
+    each line of the completion arrives.
     """
     try:
         db = get_db()
-        # Get deterioration data for the provided IDs
-        deteriorations = list(db.deterioration.find({"id": {"$in": deterioration_ids}}, {'_id': 0}))
+        deterioration_list = await db.find("deterioration", {}, {'_id': 0})
+        equipment = await db.find_one("equipment", {"id": equipment_id}, {'_id': 0})
+        if not equipment:
+            raise HTTPException(status_code=404, detail=f"Equipment with ID {equipment_id} not found")
+        fluid = await db.find_one("fluids", {"id": fluid_id}, {'_id': 0})
+        if not fluid:
+            raise HTTPException(status_code=404, detail=f"Fluid with ID {fluid_id} not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=f"Error fetching deterioration data: {str(e)}")
+    
+    # The response is cancelled when the client disconnects, which closes the LLM stream
+    return StreamingResponse(
+        stream_deterioration_verdicts(equipment, fluid, deterioration_list),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class RelevancePair(BaseModel):
+    equipment_id: str
+    fluid_id: str
+
+class RelevanceBatchRequest(BaseModel):
+    pairs: List[RelevancePair]
+
+def pack_pairs(pairs: List[tuple], catalog: List[Dict], mechanisms: List[Dict]) -> List[List[tuple]]:
+    """
+    Split (equipment, fluid) pairs into groups that fit the prompt token budget.
+    """
+    available = PROMPT_TOKEN_BUDGET - batch_fixed_tokens(catalog, mechanisms)
+    groups, current, used = [], [], 0
+    for equipment, fluid in pairs:
+        cost = estimate_tokens(format_batch_pair(len(current) + 1, equipment, fluid)) + len(mechanisms) // 4 + 4
+        if current and (used + cost > available or len(current) >= BATCH_MAX_PAIRS_PER_PROMPT):
+            groups.append(current)
+            current, used = [], 0
+        current.append((equipment, fluid))
+        used += cost
+    if current:
+        groups.append(current)
+    return groups
+
+def parse_batch_verdicts(text: str, pair_count: int, mechanism_count: int) -> Dict[int, List[bool]]:
+    """
+    Parse 'P<n>: TFTF...' lines into {pair number: verdicts}, skipping malformed lines.
+    """
+    verdicts = {}
+    for match in BATCH_VERDICT_PATTERN.finditer(text):
+        index = int(match.group(1))
+        flags = [flag.upper() == "T" for flag in re.findall(r"[TtFf]", match.group(2))]
+        if 1 <= index <= pair_count and len(flags) == mechanism_count:
+            verdicts[index] = flags
+    return verdicts
+
+async def request_batch_relevance(pairs: List[tuple], catalog: List[Dict], mechanisms: List[Dict]) -> Dict[int, List[str]]:
+    """
+    Ask the LLM about several equipment/fluid pairs against one mechanism list in a single prompt.
+    
+    Returns:
+        Dictionary mapping each pair's position in pairs to its relevant mechanism IDs;
+        pairs whose line could not be parsed are left out.
+    """
+    response_text = await llm.complete(
+        messages=build_batch_relevance_messages(pairs, catalog, mechanisms),
+        temperature=0.1,
+        label=f"batch relevance ({len(pairs)} pairs)"
+    )
+    verdicts = parse_batch_verdicts(response_text, len(pairs), len(mechanisms))
+    return {
+        index - 1: [m["id"] for m, relevant in zip(mechanisms, flags) if relevant]
+        for index, flags in verdicts.items()
+    }
+
+@app.post("/deterioration/batch", response_model=Dict[str, List[Dict[str, Any]]])
+async def get_deterioration_batch(request: Request, batch: RelevanceBatchRequest):
+    """
+    Returns relevant deterioration IDs for many equipment/fluid pairs at once.
+    
+    Pairs are de-duplicated and served from the relevance matrix where possible,
+    then clear-cut cells are decided by the rule prefilter; pairs left with
+    ambiguous cells are packed into as few LLM prompts as the token budget allows and
+    those prompts run concurrently. Matrix rows are read in one query and written
+    back in one bulk write per prompt. Pairs whose verdicts cannot be parsed from a
+    packed response fall back to concurrent single-pair analyses.
+    """
+    try:
+        db = get_db()
+        keys = list(dict.fromkeys((p.equipment_id, p.fluid_id) for p in batch.pairs))
+        mechanisms = await db.find("deterioration", {}, {'_id': 0})
+        equipment = {e["id"]: e for e in await db.find(
+            "equipment", {"id": {"$in": list({k[0] for k in keys})}}, {'_id': 0})}
+        fluids = {f["id"]: f for f in await db.find(
+            "fluids", {"id": {"$in": list({k[1] for k in keys})}}, {'_id': 0})}
         
-        if not deteriorations:
-            return {"failure_scenarios": []}
+        results = {}
+        pending = []
+        updates = []
+        found = [(equipment[k[0]], fluids[k[1]]) for k in keys if k[0] in equipment and k[1] in fluids]
+        rows = await fetch_rows(db, found)
+        for equipment_id, fluid_id in keys:
+            if equipment_id not in equipment or fluid_id not in fluids:
+                results[(equipment_id, fluid_id)] = {"error": "Equipment or fluid not found"}
+                continue
+            e, f = equipment[equipment_id], fluids[fluid_id]
+            row = rows.get((equipment_id, fluid_id))
+            relevant_ids, missing = row_verdicts(row, e, f, mechanisms)
+            rule_verdicts, ambiguous = prefilter_mechanisms(e, f, missing)
+            known = set(relevant_ids) | {id for id, verdict in rule_verdicts.items() if verdict}
+            if ambiguous:
+                pending.append((e, f, row, rule_verdicts, known, {m["id"] for m in ambiguous}))
+                continue
+            if missing:
+                updates.append(merge_row(row, e, f, mechanisms, rule_verdicts))
+            results[(equipment_id, fluid_id)] = {"relevant_ids": [m["id"] for m in mechanisms if m["id"] in known]}
+        await store_rows(db, updates)
         
-        # Get all failure scenarios from database
-        failure_scenarios = list(db.failure_scenarios.find({}, {'_id': 0}))
+        async def resolve_chunk(entries):
+            try:
+                verdicts = await request_batch_relevance([entry[:2] for entry in entries], mechanisms, asked)
+            except Exception as e:
+                print(f"Error in batch LLM analysis: {str(e)}")
+                verdicts = {}
+            chunk_updates, fallbacks = [], []
+            for offset, (e, f, row, rule_verdicts, known, ambiguous_ids) in enumerate(entries):
+                if offset not in verdicts:
+                    fallbacks.append((e, f))
+                    continue
+                # A parsed line carries a flag for every asked mechanism
+                llm_ids = set(verdicts[offset]) & ambiguous_ids
+                relevant = known | llm_ids
+                cells = {**rule_verdicts, **{id: id in llm_ids for id in ambiguous_ids}}
+                chunk_updates.append(merge_row(row, e, f, mechanisms, cells))
+                results[(e["id"], f["id"])] = {"relevant_ids": [m["id"] for m in mechanisms if m["id"] in relevant]}
+            await store_rows(db, chunk_updates)
+            
+            # Unparseable lines or a failed prompt: ask about those pairs on their own,
+            # concurrently; the LLM client bounds how many run at once
+            resolved = await asyncio.gather(*(resolve_deterioration_relevance(e, f, mechanisms) for e, f in fallbacks))
+            for (e, f), result in zip(fallbacks, resolved):
+                results[(e["id"], f["id"])] = result
         
-        if not failure_scenarios:
-            return {"failure_scenarios": []}
+        # Every packed prompt asks about the union of the pairs' ambiguous mechanisms
+        # so they share one catalog section; each pair keeps only its own cells
+        asked_ids = set().union(*(entry[5] for entry in pending))
+        asked = [m for m in mechanisms if m["id"] in asked_ids]
+        chunks = []
+        start = 0
+        for group in pack_pairs([entry[:2] for entry in pending], mechanisms, asked):
+            chunks.append(pending[start:start + len(group)])
+            start += len(group)
+        print(f"Batch of {len(keys)} pairs: {len(pending)} need analysis in {len(chunks)} LLM prompts")
         
-        # Format deteriorations into a single string
-        deteriorations_str = "\n\n".join([
-            f"Deterioration {i+1}:\n"
-            f"- Name: {d.get('name', 'N/A')}\n"
-            f"- Description: {d.get('description', 'N/A')}\n"
-            f"- Affected Areas: {', '.join(d.get('affectedAreas', []))}\n"
-            f"- Contributing Factors: {', '.join(d.get('contributingFactors', []))}"
-            for i, d in enumerate(deteriorations)
-        ])
-
-        # Format failure scenarios for the prompt
-        scenarios_str = "\n\n".join([
-            f"Scenario {i+1}:\n"
-            f"- Name: {s.get('name', 'N/A')}\n"
-            f"- Description: {s.get('description', 'N/A')}\n"
-            f"- Affected Components: {', '.join(s.get('affectedComponents', []))}\n"
-            f"- Mitigation Strategies: {', '.join(s.get('mitigationStrategies', []))}"
-            for i, s in enumerate(failure_scenarios)
-        ])
-
-        prompt = f"""
-        Analyze which failure scenarios are relevant for the following deterioration mechanisms.
-        Each line of the response should have true or false and nothing else corresponding to whether a failure scenario is relevant.
-
-        Deterioration Mechanisms:
-        {deteriorations_str}
-
-        Possible Failure Scenarios:
-        {scenarios_str}
-        """
-
-        response = client.chat.completions.create(
-            model="meta-llama/llama-3.3-70b-instruct:free",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an expert in materials science and failure analysis. 
-                    Analyze which failure scenarios are relevant for the given deterioration mechanisms.
-                    Consider the nature of the deterioration, affected areas, and contributing factors.
-                    Each line true or false for each failure scenario and nothing else.
-                    only return the list and nothing else"""
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.1
-        )
-
-        # Parse the response
-        response_text = response.choices[0].message.content
-        relevant_scenarios = []
+        await cancel_on_disconnect(request, asyncio.gather(*(resolve_chunk(entries) for entries in chunks)))
+        
+        return {"results": [
+            {"equipment_id": equipment_id, "fluid_id": fluid_id, **results[(equipment_id, fluid_id)]}
+            for equipment_id, fluid_id in keys
+        ]}
         
-        for i, line in enumerate(response_text.split("\n")):
-            if i < len(failure_scenarios) and "true" in line.strip().lower():
-                relevant_scenarios.append(failure_scenarios[i])
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=f"Error analyzing deterioration batch: {str(e)}")
 
-        return {"failure_scenarios": relevant_scenarios}
+async def request_failure_scenarios(deterioration_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Use OpenRouter API to analyze which failure scenarios are relevant for given deterioration mechanisms.
+    Raises on LLM errors so failed analyses are never cached.
+    """
+    db = get_db()
+    # Get deterioration data for the provided IDs
+    deteriorations = await db.find("deterioration", {"id": {"$in": deterioration_ids}}, {'_id': 0})
+    
+    if not deteriorations:
+        return {"failure_scenarios": []}
+    
+    # Get all failure scenarios from database
+    failure_scenarios = await db.find("failure_scenarios", {}, {'_id': 0})
+    
+    if not failure_scenarios:
+        return {"failure_scenarios": []}
+    
+    prompts = build_failure_prompts(deteriorations, failure_scenarios)
+    responses = await asyncio.gather(*(
+        llm.complete(messages=messages, temperature=0.1, label="failure scenarios")
+        for _, messages, _ in prompts
+    ))
+    
+    # Parse the responses
+    verdicts = {}
+    for (_, _, codes), response_text in zip(prompts, responses):
+        verdicts.update(parse_verdicts(response_text, codes))
+    relevant_scenarios = [s for s in failure_scenarios if verdicts.get(s["id"])]
 
+    return {"failure_scenarios": relevant_scenarios}
+
+async def rank_failure_scenarios(deterioration_ids: List[str]) -> Tuple[Dict[str, List[Dict[str, Any]]], bool]:
+    """
+    Rank failure scenarios from the historical association model.
+    
+    Mechanisms the model has too little history for are sent to the LLM and
+    its scenarios are appended after the ranked ones. Without a model every
+    mechanism goes to the LLM. If that fallback fails, the history-ranked
+    scenarios are still returned.
+    
+    Returns:
+        Tuple of (result, whether every mechanism was answered)
+    """
+    if scenario_model is None:
+        return await request_failure_scenarios(deterioration_ids), True
+    
+    ranked = scenario_model.rank(deterioration_ids)
+    unseen = scenario_model.unseen(deterioration_ids)
+    fallback, complete = [], True
+    if unseen:
+        try:
+            fallback = (await request_failure_scenarios(unseen))["failure_scenarios"]
+        except Exception as e:
+            print(f"Error in LLM analysis for {', '.join(unseen)}: {str(e)}")
+            complete = False
+    
+    failure_scenarios = {s["id"]: s for s in await get_db().find("failure_scenarios", {}, {'_id': 0})}
+    result = [
+        {**failure_scenarios[r["id"]], "confidence": r["confidence"], "support": r["support"], "source": "history"}
+        for r in ranked if r["id"] in failure_scenarios
+    ]
+    seen = {s["id"] for s in result}
+    result += [{**s, "source": "llm"} for s in fallback if s["id"] not in seen]
+    return {"failure_scenarios": result}, complete
+
+async def analyze_failure_scenarios(deterioration_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Return the relevant failure scenarios for a set of deterioration mechanisms.
+    
+    Results are memoized under the sorted, de-duplicated ID set and the current
+    versions of the collections the prompt is built from, so the same selection
+    in any order is answered without another LLM call. Results missing a failed
+    LLM fallback are returned but not memoized.
+    """
+    id_set = sorted({id for id in deterioration_ids if id})
+    versions = await catalog_versions.get_many(["deterioration", "failure_scenarios"]) if catalog_versions else {}
+    key = (tuple(id_set), versions.get("deterioration"), versions.get("failure_scenarios"))
+    
+    cached = failure_scenario_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    try:
+        result, complete = await rank_failure_scenarios(id_set)
     except Exception as e:
         print(f"Error in LLM analysis: {str(e)}")
         return {"failure_scenarios": []}
+    
+    if complete:
+        failure_scenario_cache.set(key, result)
+    return result
 
 @app.get("/failure_scenarios", response_model=Dict[str, List[Dict[str, Any]]])
-async def get_failure_scenarios(deterioration_ids: str):
+async def get_failure_scenarios(request: Request, deterioration_ids: str):
     """
     Returns a list of relevant failure scenarios based on deterioration mechanisms.
-    Uses LLM to determine relevance.
+    Ranks them from historical assessments, using the LLM for mechanisms with little history.
     
     Args:
         deterioration_ids: Comma-separated list of deterioration IDs
     """
     try:
         # Convert comma-separated string to list
-        id_list = [id.strip() for id in deterioration_ids.split(",")]
+        id_list = [id.strip() for id in deterioration_ids.split(",") if id.strip()]
         
-        # Get relevant failure scenarios
-        result = await analyze_failure_scenarios(id_list)
+        # Get relevant failure scenarios, sharing the work with identical in-flight requests
+        result = await cancel_on_disconnect(
+            request,
+            analysis_flights.do(
+                ("failure_scenarios", tuple(sorted(set(id_list)))),
+                lambda: analyze_failure_scenarios(id_list)
+            )
+        )
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=f"Error analyzing failure scenarios: {str(e)}")
 
+@app.get("/precedents", response_model=Dict[str, List[Dict[str, Any]]])
+async def get_precedents(description: str = None, equipment_id: str = None, fluid_id: str = None,
+                         k: int = Query(5, ge=1, le=50)):
+    """
+    Returns the past assessments most similar to an equipment/fluid description,
+    with their credible mechanisms and failure scenarios, and the mechanisms
+    ranked by similarity-weighted support across those precedents.
+    
+    Args:
+        description: Free-text equipment and fluid description
+        equipment_id: Equipment whose catalog entry describes the query
+        fluid_id: Fluid whose catalog entry describes the query
+        k: Number of precedents to return
+    """
+    if precedent_index is None:
+        raise HTTPException(status_code=503, detail="Precedent index not built")
+    try:
+        parts = [description] if description else []
+        db = get_db() if equipment_id or fluid_id else None
+        if equipment_id:
+            equipment = await db.find_one("equipment", {"id": equipment_id}, {'_id': 0})
+            if not equipment:
+                raise HTTPException(status_code=404, detail=f"Equipment with ID {equipment_id} not found")
+            parts += [equipment.get(field, "") for field in ("name", "category", "type", "subtype")]
+        if fluid_id:
+            fluid = await db.find_one("fluids", {"id": fluid_id}, {'_id': 0})
+            if not fluid:
+                raise HTTPException(status_code=404, detail=f"Fluid with ID {fluid_id} not found")
+            parts += [fluid.get(field, "") for field in ("name", "category")]
+        if not parts:
+            raise HTTPException(status_code=400, detail="Provide a description, equipment_id or fluid_id")
+        
+        precedents = precedent_index.search(" ".join(parts), k)
+        return {"precedents": precedents, "mechanisms": vote_mechanisms(precedents)}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=f"Error searching precedents: {str(e)}")
+
+async def refresh_search_index(force: bool = False) -> bool:
+    """
+    Load the search index snapshot if it changed since it was last loaded,
+    checking the file at most every SEARCH_INDEX_CHECK_SECONDS.
+    
+    Returns:
+        Whether an index is available
+    """
+    global search_index, search_index_mtime, search_index_checked
+    loop = asyncio.get_running_loop()
+    if not force and loop.time() - search_index_checked < SEARCH_INDEX_CHECK_SECONDS:
+        return search_index is not None
+    search_index_checked = loop.time()
+    try:
+        mtime = os.stat(SEARCH_INDEX_PATH).st_mtime
+        if mtime != search_index_mtime:
+            search_index = await loop.run_in_executor(None, SearchIndex.load, SEARCH_INDEX_PATH)
+            search_index_mtime = mtime
+            print(f"Loaded search index with {search_index.stats()['documents']} documents")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error loading search index: {str(e)}")
+    return search_index is not None
+
+@app.get("/search", response_model=Dict[str, List[Dict[str, Any]]])
+async def search_assessments(q: str, k: int = Query(10, ge=1, le=100)):
+    """
+    Full-text BM25 search over extracted failure scenarios, deterioration
+    mechanisms, deterioration comments and equipment descriptions.
+    
+    Args:
+        q: Search terms
+        k: Number of results
+    """
+    if not await refresh_search_index():
+        raise HTTPException(status_code=503, detail="Search index not built")
+    try:
+        return {"results": search_index.search(q, k)}
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=f"Error searching assessments: {str(e)}")
+
+@app.get("/cache/stats", response_model=Dict[str, Dict[str, int]])
+async def get_cache_stats():
+    """
+    Returns hit/miss counters for the analysis caches and request coalescing,
+    and LLM token usage since startup.
+    """
+    stats = {
+        "failure_scenarios": failure_scenario_cache.stats(),
+        "coalescing": analysis_flights.stats(),
+        "llm": llm.usage
+    }
+    if relevance_cache:
+        stats["relevance"] = relevance_cache.stats()
+    return stats
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import random
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import openai
+from fastapi import HTTPException, Request
+from openai import AsyncOpenAI
+
+from prompts import estimate_tokens, message_tokens
+
+# LLM endpoint settings; point LLM_BASE_URL at a local OpenAI-compatible stub for testing
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "meta-llama/llama-3.3-70b-instruct:free")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+
+# Errors worth retrying: transport failures, timeouts, rate limits and 5xx responses
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+# How often a pending analysis checks whether the HTTP client has gone away
+DISCONNECT_POLL_SECONDS = 0.5
+
+class LLMClient:
+    """
+    Async chat-completion client with a pooled HTTP connection, bounded
+    concurrency, per-call deadlines and jittered exponential-backoff retries.
+    """
+
+    def __init__(self, base_url: str = LLM_BASE_URL, api_key: Optional[str] = None,
+                 model: str = LLM_MODEL, timeout: float = LLM_TIMEOUT_SECONDS,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=httpx.Timeout(timeout),
+        )
+        # Retries are handled here so they share the caller's deadline
+        self.client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key or os.getenv("OPENROUTER_API_KEY") or "not-set",
+            http_client=self.http_client,
+            max_retries=0,
+        )
+
+    async def create(self, messages: List[Dict[str, str]], **kwargs):
+        """
+        Issue one chat completion once a concurrency slot is free.
+        """
+        async with self.semaphore:
+            return await self.client.chat.completions.create(model=self.model, messages=messages, **kwargs)
+
+    def record_usage(self, label: str, messages: List[Dict[str, str]], usage, elapsed: float,
+                     completion: str = ""):
+        """
+        Accumulate and print the token counts of one call, estimating them when
+        the provider reports no usage.
+        """
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        else:
+            prompt_tokens, completion_tokens = message_tokens(messages), estimate_tokens(completion)
+        self.usage["calls"] += 1
+        self.usage["prompt_tokens"] += prompt_tokens
+        self.usage["completion_tokens"] += completion_tokens
+        print(f"LLM {label}: {prompt_tokens} prompt + {completion_tokens} completion tokens in {elapsed:.2f}s")
+
+    async def complete(self, messages: List[Dict[str, str]], deadline: Optional[float] = None,
+                       label: str = "call", **kwargs: Any) -> str:
+        """
+        Return the content of a chat completion, retrying transient failures.
+
+        Args:
+            messages: Chat messages to send
+            deadline: Total seconds allowed, including queueing and retries
+                (defaults to the client timeout)
+            label: Name of the analysis in the token usage report
+            **kwargs: Extra arguments for chat.completions.create
+
+        Returns:
+            Content of the first choice
+        """
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + (deadline or self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            remaining = expires - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError("LLM deadline exceeded")
+            try:
+                started = loop.time()
+                response = await asyncio.wait_for(self.create(messages, **kwargs), timeout=remaining)
+                self.record_usage(label, messages, response.usage, loop.time() - started)
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                remaining = expires - loop.time()
+                if attempt == self.max_retries or remaining <= 0:
+                    raise
+                # Full jitter keeps retries from synchronising across requests
+                delay = min(random.uniform(0, LLM_RETRY_BASE_DELAY * 2 ** attempt), remaining)
+                print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def stream(self, messages: List[Dict[str, str]], deadline: Optional[float] = None,
+                     label: str = "call", **kwargs: Any) -> AsyncIterator[str]:
+        """
+        Yield the content of a streamed chat completion as it arrives.
+
+        Failures before the first token are retried like complete(); later ones
+        are raised, since the caller has already consumed part of the output.
+        The concurrency slot is held until the stream ends or is closed.
+
+        Args:
+            messages: Chat messages to send
+            deadline: Total seconds allowed for the whole stream (defaults to the client timeout)
+            label: Name of the analysis in the token usage report
+            **kwargs: Extra arguments for chat.completions.create
+        """
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + (deadline or self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            received = []
+            try:
+                async with self.semaphore:
+                    started = loop.time()
+                    remaining = expires - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError("LLM deadline exceeded")
+                    stream = await asyncio.wait_for(
+                        self.client.chat.completions.create(model=self.model, messages=messages, stream=True, **kwargs),
+                        timeout=remaining
+                    )
+                    # Close the upstream response however the consumer stops, so an abandoned
+                    # generator does not leave the connection open while holding the slot
+                    try:
+                        chunks = stream.__aiter__()
+                        while True:
+                            remaining = expires - loop.time()
+                            if remaining <= 0:
+                                raise asyncio.TimeoutError("LLM deadline exceeded")
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining)
+                            except StopAsyncIteration:
+                                break
+                            content = chunk.choices[0].delta.content if chunk.choices else None
+                            if content:
+                                received.append(content)
+                                yield content
+                        self.record_usage(label, messages, None, loop.time() - started, "".join(received))
+                    finally:
+                        await stream.close()
+                    return
+            except RETRYABLE_ERRORS as e:
+                remaining = expires - loop.time()
+                if received or attempt == self.max_retries or remaining <= 0:
+                    raise
+                delay = min(random.uniform(0, LLM_RETRY_BASE_DELAY * 2 ** attempt), remaining)
+                print(f"LLM stream failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+async def cancel_on_disconnect(request: Request, awaitable):
+    """
+    Await a coroutine, cancelling it if the HTTP client disconnects first.
+
+    Args:
+        request: Incoming request whose connection is watched
+        awaitable: Coroutine to run
+
+    Returns:
+        Result of the coroutine
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+            # A cancelled gather() finishes with an exception nobody awaits; mark it retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
@@ -0,0 +1,145 @@
+import json
+import sqlite3
+
+# Number of item rows buffered before a sink writes them out
+DEFAULT_BATCH_SIZE = 5000
+
+def iter_item_rows(file_name, record):
+    """
+    Flatten one extracted DXL document record into item rows.
+
+    Args:
+        file_name: Name of the DXL file the document came from
+        record: Document record with 'unid' and 'items' (family -> {item name: text})
+
+    Yields:
+        Dictionaries with 'unid', 'file', 'family', 'index' and 'text'
+    """
+    for family, items in record["items"].items():
+        for item_name, text in items.items():
+            yield {
+                "unid": record["unid"],
+                "file": file_name,
+                "family": family,
+                "index": item_name[len(family) + 1:],
+                "text": text
+            }
+
+class SqliteSink:
+    """
+    Write extracted items to an SQLite table, one row per item.
+
+    Rows are buffered and written in batches inside a single transaction, and a
+    re-exported document replaces all of its previous rows. Documents are keyed by
+    UNID: one without a UNID is skipped, and a UNID queued twice keeps only its
+    last copy.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS dxl_items (
+                unid TEXT NOT NULL,
+                file TEXT NOT NULL,
+                family TEXT NOT NULL,
+                item_index TEXT NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (unid, family, item_index)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS dxl_items_family ON dxl_items (family)")
+        # Buffered rows by UNID, so a repeated document replaces its earlier copy
+        self.documents = {}
+        self.pending_rows = 0
+        self.count = 0
+
+    def write_document(self, file_name, record):
+        """
+        Queue all items of one document record for writing.
+        """
+        unid = record["unid"]
+        if not unid:
+            print(f"Skipping document without UNID in {file_name}")
+            return
+        rows = [
+            (unid, row["file"], row["family"], row["index"], row["text"])
+            for row in iter_item_rows(file_name, record)
+        ]
+        previous = self.documents.pop(unid, None)
+        if previous is not None:
+            self.pending_rows -= len(previous)
+        self.documents[unid] = rows
+        self.pending_rows += len(rows)
+        if self.pending_rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered rows in one transaction.
+        """
+        if not self.documents:
+            return
+        rows = [row for rows in self.documents.values() for row in rows]
+        with self.connection:
+            self.connection.executemany("DELETE FROM dxl_items WHERE unid = ?", [(unid,) for unid in self.documents])
+            self.connection.executemany(
+                "INSERT INTO dxl_items (unid, file, family, item_index, text) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        self.count += len(rows)
+        self.documents = {}
+        self.pending_rows = 0
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+class JsonlSink:
+    """
+    Write extracted items as JSON Lines, one object per item.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.file = open(path, 'w', encoding='utf-8')
+        self.lines = []
+        self.count = 0
+
+    def write_document(self, file_name, record):
+        """
+        Queue all items of one document record for writing.
+        """
+        for row in iter_item_rows(file_name, record):
+            self.lines.append(json.dumps(row, ensure_ascii=False))
+        if len(self.lines) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered lines to the file.
+        """
+        if self.lines:
+            self.file.write("\n".join(self.lines) + "\n")
+            self.count += len(self.lines)
+            self.lines = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
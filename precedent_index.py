@@ -0,0 +1,229 @@
+import argparse
+import json
+import math
+import os
+import re
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from field_extraction import document_key, find_dxl_files, iter_document_records
+
+# Where the offline-built index is written and loaded from; records go in a JSON sidecar
+PRECEDENT_INDEX_PATH = os.getenv("PRECEDENT_INDEX_PATH", "precedent_index.npz")
+
+# Item families read from each assessment
+PRECEDENT_FAMILIES = ("Field_Tx_1", "Field_Tx_2", "Deterioration_Tx", "DetCredible_Tx", "Field_Tx_6")
+
+# Field_Tx_1 items describing the equipment: description, type, subtype, design code
+EQUIPMENT_ITEMS = ("Field_Tx_1_6", "Field_Tx_1_7", "Field_Tx_1_8", "Field_Tx_1_16")
+
+# Field_Tx_2 items describing the fluid(s): primary and secondary service and remarks
+FLUID_ITEMS = ("Field_Tx_2_1", "Field_Tx_2_101", "Field_Tx_2_13", "Field_Tx_2_113")
+
+# Placeholder values that carry no information
+EMPTY_VALUES = {"", "-", "--", "---", "n/a", "none", "none.", "no identified failure scenarios"}
+
+# Number of hashed feature buckets (a power of two)
+FEATURE_DIMENSIONS = 1 << 20
+
+# Lowercase word tokens; each also contributes its padded character trigrams
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def is_empty(value: Optional[str]) -> bool:
+    return value is None or value.strip().lower() in EMPTY_VALUES
+
+def join_items(items: Dict[str, str], names) -> str:
+    return "; ".join(items[name] for name in names if not is_empty(items.get(name)))
+
+def credible_mechanisms(items: Dict[str, Dict[str, str]]) -> List[str]:
+    """
+    Names of the deterioration mechanisms an assessment marked credible at any location.
+
+    DetCredible_Tx_<n>_<location> holds "Yes"/"No" for mechanism Deterioration_Tx_<n>.
+    """
+    credible = set()
+    for name, value in items.get("DetCredible_Tx", {}).items():
+        if value.strip().lower() == "yes":
+            credible.add(name.split("_")[2])
+    names = items.get("Deterioration_Tx", {})
+    return [
+        names[name] for name in sorted(names, key=lambda n: int(n.rsplit("_", 1)[1]))
+        if name.rsplit("_", 1)[1] in credible and not is_empty(names[name])
+    ]
+
+def precedent_record(key: str, items: Dict[str, Dict[str, str]]) -> Optional[Dict[str, Any]]:
+    """
+    Summarize one extracted assessment, or None if it describes no equipment or fluid.
+    """
+    equipment = join_items(items.get("Field_Tx_1", {}), EQUIPMENT_ITEMS)
+    fluid = join_items(items.get("Field_Tx_2", {}), FLUID_ITEMS)
+    if not equipment and not fluid:
+        return None
+    scenarios = items.get("Field_Tx_6", {})
+    return {
+        "key": key,
+        "equipment": equipment,
+        "fluid": fluid,
+        "mechanisms": credible_mechanisms(items),
+        "failure_scenarios": [value for value in scenarios.values() if not is_empty(value)]
+    }
+
+def iter_precedent_records(folder_path: str):
+    """
+    Yield a precedent record for every assessment document under a folder.
+    """
+    for file_path in find_dxl_files(folder_path):
+        try:
+            documents = list(iter_document_records(file_path, PRECEDENT_FAMILIES))
+        except Exception as e:
+            print(f"Error processing {file_path.name}: {str(e)}")
+            continue
+        for document in documents:
+            record = precedent_record(document_key(file_path, document, len(documents)), document["items"])
+            if record:
+                yield record
+
+def text_features(text: str) -> Dict[int, float]:
+    """
+    Hashed word and character-trigram counts of a text.
+    """
+    counts = {}
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        padded = f" {token} "
+        features = [f"w:{token}"] + [f"c:{padded[i:i+3]}" for i in range(len(padded) - 2)]
+        for feature in features:
+            bucket = zlib.crc32(feature.encode("utf-8")) & (FEATURE_DIMENSIONS - 1)
+            counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+def record_text(record: Dict[str, Any]) -> str:
+    return f"{record['equipment']} {record['fluid']}"
+
+class PrecedentIndex:
+    """
+    TF-IDF index of past assessments over hashed n-gram features.
+
+    Document vectors are stored column-wise (feature -> documents and weights)
+    so a query only touches the postings of its own features.
+    """
+
+    def __init__(self, feature_ptr: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray,
+                 idf: np.ndarray, records: List[Dict[str, Any]]):
+        self.feature_ptr = feature_ptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.idf = idf
+        self.records = records
+
+    @classmethod
+    def build(cls, records: List[Dict[str, Any]]) -> "PrecedentIndex":
+        """
+        Vectorize records with sublinear TF, smoothed IDF and L2 normalization.
+        """
+        counts = [text_features(record_text(record)) for record in records]
+        df = np.zeros(FEATURE_DIMENSIONS, dtype=np.int32)
+        for doc in counts:
+            df[list(doc)] += 1
+        idf = (np.log((len(records) + 1) / (df + 1)) + 1).astype(np.float32)
+
+        features, doc_ids, weights = [], [], []
+        for doc_id, doc in enumerate(counts):
+            if not doc:
+                continue
+            buckets = np.fromiter(doc.keys(), dtype=np.int64, count=len(doc))
+            tf = 1 + np.log(np.fromiter(doc.values(), dtype=np.float32, count=len(doc)))
+            vector = tf * idf[buckets]
+            vector /= np.linalg.norm(vector)
+            features.append(buckets)
+            doc_ids.append(np.full(len(doc), doc_id, dtype=np.int32))
+            weights.append(vector.astype(np.float32))
+
+        features = np.concatenate(features) if features else np.zeros(0, dtype=np.int64)
+        doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32)
+        weights = np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32)
+        order = np.argsort(features, kind="stable")
+        feature_ptr = np.zeros(FEATURE_DIMENSIONS + 1, dtype=np.int64)
+        np.cumsum(np.bincount(features, minlength=FEATURE_DIMENSIONS), out=feature_ptr[1:])
+        return cls(feature_ptr, doc_ids[order], weights[order], idf, records)
+
+    def save(self, path: str = PRECEDENT_INDEX_PATH):
+        np.savez_compressed(path, feature_ptr=self.feature_ptr, doc_ids=self.doc_ids,
+                            weights=self.weights, idf=self.idf)
+        with open(Path(path).with_suffix(".json"), "w", encoding="utf-8") as f:
+            json.dump(self.records, f)
+
+    @classmethod
+    def load(cls, path: str = PRECEDENT_INDEX_PATH) -> "PrecedentIndex":
+        with np.load(path) as arrays:
+            feature_ptr, doc_ids = arrays["feature_ptr"], arrays["doc_ids"]
+            weights, idf = arrays["weights"], arrays["idf"]
+        with open(Path(path).with_suffix(".json"), encoding="utf-8") as f:
+            records = json.load(f)
+        return cls(feature_ptr, doc_ids, weights, idf, records)
+
+    def search(self, text: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Return the k past assessments most similar to a description.
+
+        Args:
+            text: Free-text equipment and fluid description
+            k: Number of results
+
+        Returns:
+            Records with an added cosine 'score', best first; records with no
+            overlap are left out
+        """
+        counts = text_features(text)
+        if not counts or not self.records or k < 1:
+            return []
+        buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        query = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[buckets]
+        query /= np.linalg.norm(query)
+
+        scores = np.zeros(len(self.records), dtype=np.float32)
+        for bucket, weight in zip(buckets, query):
+            start, end = self.feature_ptr[bucket], self.feature_ptr[bucket + 1]
+            # Each document appears at most once per feature, so fancy-index += is safe
+            scores[self.doc_ids[start:end]] += weight * self.weights[start:end]
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{**self.records[i], "score": round(float(scores[i]), 4)} for i in top if scores[i] > 0]
+
+def vote_mechanisms(precedents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Rank mechanism names by the similarity-weighted share of precedents that found them credible.
+    """
+    total = sum(p["score"] for p in precedents)
+    votes = {}
+    for precedent in precedents:
+        for name in set(precedent["mechanisms"]):
+            entry = votes.setdefault(name.strip().lower(), {"name": name, "score": 0.0, "support": 0})
+            entry["score"] += precedent["score"]
+            entry["support"] += 1
+    ranked = sorted(votes.values(), key=lambda v: -v["score"])
+    for entry in ranked:
+        entry["score"] = round(entry["score"] / total, 4) if total else 0.0
+    return ranked
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the historical precedent index from DXL assessments")
+    parser.add_argument("folder", help="Folder containing DXL files")
+    parser.add_argument("--output", default=PRECEDENT_INDEX_PATH, help="Index file (.npz)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    records = list(iter_precedent_records(args.folder))
+    index = PrecedentIndex.build(records)
+    index.save(args.output)
+    with_mechanisms = sum(1 for r in records if r["mechanisms"])
+    print(f"Indexed {len(records)} assessments ({with_mechanisms} with credible mechanisms, "
+          f"{len(index.doc_ids)} postings) in {time.perf_counter() - started:.1f}s -> {args.output}")
+
+if __name__ == "__main__":
+    main()
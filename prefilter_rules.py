@@ -0,0 +1,125 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from initial_data import DETERIORATION_DATA, EQUIPMENT_DATA, FLUIDS_DATA
+
+# Verdicts from these rules are stored in the relevance matrix; bump this after
+# changing them so stored rows are recomputed. Only exclusions that follow from
+# the fluid's traits are decided here; anything that could be relevant goes to
+# the LLM, since a heuristic "relevant" would be stored as if it were an answer
+PREFILTER_RULES_VERSION = "2"
+
+# Service traits implied by a fluid's category
+FLUID_CATEGORY_TRAITS = {
+    "Gas": {"gas"},
+    "Liquid - Hydrocarbon": {"liquid", "corrosive"},
+    "Liquid - Aqueous": {"liquid", "water", "corrosive"},
+    "Slurry": {"liquid", "water", "solids", "corrosive"},
+}
+
+# Extra traits of individual fluids, added to their category traits
+FLUID_TRAITS = {
+    "gas-natural": {"corrosive"},
+    "gas-hydrogen": {"hydrogen"},
+    "gas-nitrogen": set(),
+    "liquid-crude": {"water", "solids", "sour", "chlorides"},
+    "liquid-acid-hcl": {"acid", "chlorides"},
+    "liquid-acid-h2so4": {"acid"},
+}
+
+# Fluid traits a contributing factor needs, any one of which will do; a
+# mechanism with an unmet factor cannot occur for the fluid
+FACTOR_REQUIREMENTS = {
+    "Oxygen Content": {"corrosive"},
+    "Fluid Chemistry": {"corrosive"},
+    "Chlorides": {"corrosive"},
+    "Corrosive Species": {"corrosive"},
+    "Oxygen Concentration Cells": {"corrosive"},
+    "Oxygen Differential": {"corrosive"},
+    "Oxygen Level": {"corrosive"},
+    "Chemical Concentration": {"corrosive"},
+    "Chemical Exposure": {"corrosive"},
+    "Electrolyte Presence": {"water"},
+    "Dissolved Oxygen": {"water"},
+    "Particle Size": {"solids"},
+    "Pressure Drops": {"liquid"},
+    "Hydrogen Partial Pressure": {"hydrogen"},
+    "Hydrogen Source": {"hydrogen", "sour", "acid"},
+    "H2S Presence": {"sour"},
+    "NH3 and HCl Concentration": {"chlorides"},
+}
+
+def fluid_traits(fluid: Dict) -> Set[str]:
+    """
+    Service traits of a fluid from its category and ID.
+    """
+    return FLUID_CATEGORY_TRAITS.get(fluid.get("category"), set()) | FLUID_TRAITS.get(fluid.get("id"), set())
+
+def evaluate_rule(equipment: Dict, fluid: Dict, mechanism: Dict, traits: Optional[Set[str]] = None) -> Tuple[Optional[bool], str]:
+    """
+    Decide one equipment/fluid/mechanism cell from the reference data alone.
+
+    Args:
+        equipment: Equipment document
+        fluid: Fluid document
+        mechanism: Deterioration mechanism document
+        traits: Precomputed fluid traits, if already known
+
+    Returns:
+        Tuple of (False when the mechanism cannot occur for the fluid, or None when
+        the cell needs expert analysis, reason for the verdict)
+    """
+    if traits is None:
+        traits = fluid_traits(fluid)
+    factors = mechanism.get("contributingFactors", [])
+
+    for factor in factors:
+        required = FACTOR_REQUIREMENTS.get(factor)
+        if required and not required & traits:
+            return False, f"{factor} needs a fluid that is {' or '.join(sorted(required))}"
+
+    return None, "ambiguous"
+
+def prefilter_mechanisms(equipment: Dict, fluid: Dict, mechanisms: List[Dict]) -> Tuple[Dict[str, bool], List[Dict]]:
+    """
+    Resolve the clear-cut mechanisms for a pair locally.
+
+    Args:
+        equipment: Equipment document
+        fluid: Fluid document
+        mechanisms: Mechanisms to decide
+
+    Returns:
+        Tuple of ({mechanism ID: relevant} for the mechanisms the rules decided,
+        mechanisms left for the LLM)
+    """
+    traits = fluid_traits(fluid)
+    verdicts = {}
+    ambiguous = []
+    for mechanism in mechanisms:
+        verdict, _ = evaluate_rule(equipment, fluid, mechanism, traits)
+        if verdict is None:
+            ambiguous.append(mechanism)
+        else:
+            verdicts[mechanism["id"]] = verdict
+    return verdicts, ambiguous
+
+def main():
+    """
+    Report how much of the reference equipment x fluid x mechanism grid the rules resolve.
+    """
+    cells = relevant = irrelevant = resolved_pairs = 0
+    for equipment in EQUIPMENT_DATA:
+        for fluid in FLUIDS_DATA:
+            verdicts, ambiguous = prefilter_mechanisms(equipment, fluid, DETERIORATION_DATA)
+            cells += len(DETERIORATION_DATA)
+            relevant += sum(verdicts.values())
+            irrelevant += len(verdicts) - sum(verdicts.values())
+            if not ambiguous:
+                resolved_pairs += 1
+    pairs = len(EQUIPMENT_DATA) * len(FLUIDS_DATA)
+    print(f"Rules resolved {relevant + irrelevant} of {cells} cells "
+          f"({relevant} relevant, {irrelevant} not relevant); "
+          f"{resolved_pairs} of {pairs} pairs need no LLM call")
+
+if __name__ == "__main__":
+    main()
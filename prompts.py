@@ -0,0 +1,264 @@
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from analysis_cache import LRUCache, fingerprint
+
+# "compact" encodes catalogs as a terse table keyed by short codes; "full" keeps
+# every attribute in labelled lines
+PROMPT_MODE = os.getenv("PROMPT_MODE", "compact")
+
+# Estimated token ceiling per prompt; larger requests are split into chunks
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+
+# Characters per token used for estimates when the provider reports no usage
+CHARS_PER_TOKEN = 4
+
+# Catalog sections by kind: code prefix, section title, compact columns and full fields
+CATALOG_FORMATS = {
+    "mechanisms": {
+        "prefix": "M",
+        "title": "Deterioration mechanisms",
+        "compact": ["name", "affectedAreas", "contributingFactors"],
+        "full": [("Name", "name"), ("Description", "description"),
+                 ("Affected Areas", "affectedAreas"), ("Contributing Factors", "contributingFactors")]
+    },
+    "scenarios": {
+        "prefix": "S",
+        "title": "Failure scenarios",
+        "compact": ["name", "affectedComponents"],
+        "full": [("Name", "name"), ("Description", "description"),
+                 ("Affected Components", "affectedComponents"),
+                 ("Mitigation Strategies", "mitigationStrategies")]
+    },
+}
+
+# Bump when the relevance prompt changes so stored and cached verdicts are not reused
+RELEVANCE_PROMPT_VERSION = "2"
+
+# Stable leading instructions; each is followed by its catalog section so the
+# whole system message is a reusable prefix for provider-side prompt caching
+RELEVANCE_INSTRUCTIONS = """You are an expert in materials science and corrosion engineering.
+Decide which deterioration mechanisms are relevant for equipment and fluid combinations,
+considering material compatibility, operating conditions and environmental factors.
+Reply only in the format requested."""
+
+FAILURE_INSTRUCTIONS = """You are an expert in materials science and failure analysis.
+Decide which failure scenarios can result from deterioration mechanisms,
+considering the nature of the deterioration, affected areas and contributing factors.
+Reply only in the format requested."""
+
+# Fields describing equipment and fluids in prompts
+EQUIPMENT_FIELDS = [("Type", "type"), ("Material", "material"),
+                    ("Operating Temperature", "operatingTemperature"), ("Operating Pressure", "operatingPressure"),
+                    ("Design Temperature", "designTemperature"), ("Design Pressure", "designPressure")]
+FLUID_FIELDS = [("Name", "name"), ("Type", "type"), ("pH", "pH"),
+                ("Temperature", "temperature"), ("Pressure", "pressure")]
+
+# One verdict per line, e.g. "M3 T", "S12: false"
+VERDICT_PATTERN = re.compile(r"^\W*([A-Z]\d+)\W+(true|false|t|f)\b", re.IGNORECASE | re.MULTILINE)
+
+class Catalog(NamedTuple):
+    """
+    Formatted catalog section with the short code of every item.
+    """
+    text: str
+    codes: Dict[str, str]
+    rows: Dict[str, str]
+
+# Formatted catalogs keyed by kind, mode and content hash
+catalog_cache = LRUCache(32)
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for budgeting prompts.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+def format_value(value) -> str:
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+def format_row(kind: str, code: str, item: Dict, mode: str) -> str:
+    spec = CATALOG_FORMATS[kind]
+    if mode == "compact":
+        return "|".join([code] + [format_value(item.get(field, "")).replace("|", "/") for field in spec["compact"]])
+    lines = [f"{code}:"] + [f"- {label}: {format_value(item.get(field, 'N/A'))}" for label, field in spec["full"]]
+    return "\n".join(lines)
+
+def format_section(kind: str, rows: List[str], mode: str) -> str:
+    spec = CATALOG_FORMATS[kind]
+    if mode == "compact":
+        header = "|".join(["code"] + spec["compact"])
+        return f"{spec['title']}:\n{header}\n" + "\n".join(rows)
+    return f"{spec['title']}:\n\n" + "\n\n".join(rows)
+
+def build_catalog(kind: str, items: List[Dict], mode: str = PROMPT_MODE) -> Catalog:
+    """
+    Format a catalog once per content and mode, reusing it across prompts.
+
+    Args:
+        kind: Key of CATALOG_FORMATS
+        items: Every document in the catalog, in collection order
+        mode: "compact" or "full"
+
+    Returns:
+        Catalog with the section text, item codes and per-item rows
+    """
+    key = (kind, mode, fingerprint(items))
+    catalog = catalog_cache.get(key)
+    if catalog is None:
+        prefix = CATALOG_FORMATS[kind]["prefix"]
+        codes = {item["id"]: f"{prefix}{i+1}" for i, item in enumerate(items)}
+        rows = {item["id"]: format_row(kind, codes[item["id"]], item, mode) for item in items}
+        catalog = Catalog(format_section(kind, list(rows.values()), mode), codes, rows)
+        catalog_cache.set(key, catalog)
+    return catalog
+
+def describe(doc: Dict, fields: List[Tuple[str, str]], mode: str) -> str:
+    """
+    Describe equipment or a fluid; compact mode leaves out fields the document lacks.
+    """
+    if mode == "compact":
+        return ", ".join(f"{label}={doc[field]}" for label, field in fields if doc.get(field) not in (None, ""))
+    return "\n".join(f"- {label}: {doc.get(field, 'N/A')}" for label, field in fields)
+
+def system_message(instructions: str, section: str) -> Dict[str, str]:
+    return {"role": "system", "content": f"{instructions}\n\n{section}"}
+
+def chunk_items(kind: str, catalog: Catalog, asked: List[Dict], fixed_tokens: int,
+                budget: int, mode: str) -> List[Tuple[List[Dict], str]]:
+    """
+    Pick the catalog section(s) for the asked items.
+
+    The full catalog is used whenever it fits the budget, so the prefix stays
+    identical across calls; otherwise the asked items are split into chunks
+    whose own sections fit.
+
+    Returns:
+        List of (items, section text)
+    """
+    if estimate_tokens(catalog.text) + fixed_tokens <= budget:
+        return [(asked, catalog.text)]
+    chunks, current, used = [], [], 0
+    header = estimate_tokens(format_section(kind, [], mode))
+    for item in asked:
+        cost = estimate_tokens(catalog.rows[item["id"]]) + 2
+        if current and header + used + cost + fixed_tokens > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        chunks.append(current)
+    return [(chunk, format_section(kind, [catalog.rows[item["id"]] for item in chunk], mode)) for chunk in chunks]
+
+def answer_instruction(codes: List[str], subject: str) -> str:
+    return (f"For each {subject} {', '.join(codes)} answer on its own line with the code "
+            f"followed by T if it is relevant or F if not, for example \"{codes[0]} T\".")
+
+def build_relevance_prompts(equipment: Optional[Dict], fluid: Optional[Dict], catalog_items: List[Dict],
+                            asked: List[Dict], mode: str = PROMPT_MODE,
+                            budget: int = PROMPT_TOKEN_BUDGET) -> List[Tuple[List[Dict], List[Dict[str, str]], Dict[str, str]]]:
+    """
+    Build the prompt(s) asking which mechanisms are relevant for one pair.
+
+    Args:
+        equipment: Equipment document, or None
+        fluid: Fluid document, or None
+        catalog_items: Full mechanism catalog, used as the stable prefix
+        asked: Mechanisms to decide
+        mode: "compact" or "full"
+        budget: Estimated token ceiling per prompt
+
+    Returns:
+        List of (mechanisms asked, chat messages, {code: mechanism ID}) per prompt,
+        empty when nothing is asked
+    """
+    if not asked:
+        return []
+    catalog = build_catalog("mechanisms", catalog_items, mode)
+    pair = (f"Equipment:\n{describe(equipment or {}, EQUIPMENT_FIELDS, mode)}\n\n"
+            f"Fluid:\n{describe(fluid or {}, FLUID_FIELDS, mode)}")
+    asked_codes = [catalog.codes[m["id"]] for m in asked]
+    fixed = estimate_tokens(RELEVANCE_INSTRUCTIONS + pair + answer_instruction(asked_codes, "mechanism"))
+    prompts = []
+    for chunk, section in chunk_items("mechanisms", catalog, asked, fixed, budget, mode):
+        codes = {catalog.codes[m["id"]]: m["id"] for m in chunk}
+        messages = [
+            system_message(RELEVANCE_INSTRUCTIONS, section),
+            {"role": "user", "content": f"{pair}\n\n{answer_instruction(list(codes), 'mechanism')}"}
+        ]
+        prompts.append((chunk, messages, codes))
+    return prompts
+
+def build_batch_relevance_messages(pairs: List[Tuple[Dict, Dict]], catalog_items: List[Dict],
+                                   asked: List[Dict], mode: str = PROMPT_MODE) -> List[Dict[str, str]]:
+    """
+    Build one prompt asking about several pairs against the same mechanisms.
+
+    Each pair is answered on a line "P<n>: " followed by one T/F letter per
+    asked mechanism, in the order listed.
+    """
+    catalog = build_catalog("mechanisms", catalog_items, mode)
+    pairs_str = "\n".join(format_batch_pair(i + 1, e, f) for i, (e, f) in enumerate(pairs))
+    order = " ".join(catalog.codes[m["id"]] for m in asked)
+    return [
+        system_message(RELEVANCE_INSTRUCTIONS, catalog.text),
+        {
+            "role": "user",
+            "content": f"Equipment/fluid pairs:\n{pairs_str}\n\n"
+                       f"For each pair answer on its own line as P<n>: followed by exactly {len(asked)} letters, "
+                       f"T if the mechanism is relevant or F if not, for mechanisms {order} in that order."
+        }
+    ]
+
+def format_batch_pair(index: int, equipment: Dict, fluid: Dict) -> str:
+    return (f"P{index}: Equipment [{describe(equipment, EQUIPMENT_FIELDS, 'compact')}] "
+            f"Fluid [{describe(fluid, FLUID_FIELDS, 'compact')}]")
+
+def batch_fixed_tokens(catalog_items: List[Dict], asked: List[Dict], mode: str = PROMPT_MODE) -> int:
+    """
+    Estimated tokens of a batch prompt before any pair lines are added.
+    """
+    catalog = build_catalog("mechanisms", catalog_items, mode)
+    return estimate_tokens(RELEVANCE_INSTRUCTIONS + catalog.text) + 3 * len(asked) + 60
+
+def build_failure_prompts(deteriorations: List[Dict], scenarios: List[Dict], mode: str = PROMPT_MODE,
+                          budget: int = PROMPT_TOKEN_BUDGET) -> List[Tuple[List[Dict], List[Dict[str, str]], Dict[str, str]]]:
+    """
+    Build the prompt(s) asking which failure scenarios follow from deterioration mechanisms.
+
+    The scenario catalog is the stable prefix; the selected mechanisms follow it.
+
+    Returns:
+        List of (scenarios asked, chat messages, {code: scenario ID}) per prompt
+    """
+    catalog = build_catalog("scenarios", scenarios, mode)
+    mechanisms = build_catalog("mechanisms", deteriorations, mode).text
+    codes_all = [catalog.codes[s["id"]] for s in scenarios]
+    fixed = estimate_tokens(FAILURE_INSTRUCTIONS + mechanisms + answer_instruction(codes_all, "scenario"))
+    prompts = []
+    for chunk, section in chunk_items("scenarios", catalog, scenarios, fixed, budget, mode):
+        codes = {catalog.codes[s["id"]]: s["id"] for s in chunk}
+        messages = [
+            system_message(FAILURE_INSTRUCTIONS, section),
+            {"role": "user", "content": f"{mechanisms}\n\n{answer_instruction(list(codes), 'scenario')}"}
+        ]
+        prompts.append((chunk, messages, codes))
+    return prompts
+
+def parse_verdicts(text: str, codes: Dict[str, str]) -> Dict[str, bool]:
+    """
+    Parse "<code> T/F" lines into {item ID: verdict}, ignoring unknown codes.
+    """
+    verdicts = {}
+    for match in VERDICT_PATTERN.finditer(text or ""):
+        code = match.group(1).upper()
+        if code in codes:
+            verdicts[codes[code]] = match.group(2).lower().startswith("t")
+    return verdicts
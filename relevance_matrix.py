@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pymongo import ReplaceOne
+
+from analysis_cache import RELEVANCE_CACHE_COLLECTION, fingerprint
+from db_access import AsyncDatabase, create_mongo_client
+from prefilter_rules import PREFILTER_RULES_VERSION
+from prompts import PROMPT_MODE, RELEVANCE_PROMPT_VERSION
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection settings
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = "inspection"
+
+# Collection holding one row of mechanism verdicts per equipment/fluid pair
+RELEVANCE_MATRIX_COLLECTION = "relevance_matrix"
+
+# Stamped on every row; rows built with another prompt, prompt mode or rule set are recomputed
+MATRIX_VERSION = f"{RELEVANCE_PROMPT_VERSION}/{PROMPT_MODE}/{PREFILTER_RULES_VERSION}"
+
+def row_matches(row: Optional[Dict], equipment: Dict, fluid: Dict) -> bool:
+    """
+    Whether a matrix row was computed for the current equipment and fluid documents
+    and the current matrix version.
+    """
+    return (row is not None and row.get("version") == MATRIX_VERSION
+            and row.get("equipment_hash") == fingerprint(equipment)
+            and row.get("fluid_hash") == fingerprint(fluid))
+
+def stale_mechanisms(row: Optional[Dict], equipment: Dict, fluid: Dict, mechanisms: List[Dict]) -> List[Dict]:
+    """
+    Return the mechanisms whose verdict for this pair is missing or out of date.
+
+    A row stores the matrix version, the hash of the equipment and fluid it was
+    computed for and, per mechanism, the hash of the mechanism document. A new
+    prompt or rule version or editing the equipment or fluid invalidates the
+    whole row; adding or editing a mechanism invalidates only that cell.
+    """
+    if not row_matches(row, equipment, fluid):
+        return list(mechanisms)
+    cells = row.get("mechanisms", {})
+    return [m for m in mechanisms if cells.get(m["id"]) != fingerprint(m)]
+
+def merge_row(row: Optional[Dict], equipment: Dict, fluid: Dict, mechanisms: List[Dict],
+              verdicts: Dict[str, bool]) -> Dict[str, Any]:
+    """
+    Build the updated matrix row after evaluating some mechanisms for a pair.
+
+    Only mechanisms with an explicit verdict become cells; one the analysis gave
+    no answer for stays missing so the next request asks about it again.
+
+    Args:
+        row: Existing row, or None
+        equipment: Equipment document
+        fluid: Fluid document
+        mechanisms: Full current mechanism catalog
+        verdicts: {mechanism ID: relevant} for the mechanisms that were decided
+
+    Returns:
+        Row document covering every mechanism still in the catalog
+    """
+    valid = row_matches(row, equipment, fluid)
+    cells = dict(row.get("mechanisms", {})) if valid else {}
+    relevant = set(row.get("relevant", [])) if valid else set()
+
+    for mechanism in mechanisms:
+        verdict = verdicts.get(mechanism["id"])
+        if verdict is None:
+            continue
+        cells[mechanism["id"]] = fingerprint(mechanism)
+        if verdict:
+            relevant.add(mechanism["id"])
+        else:
+            relevant.discard(mechanism["id"])
+
+    # Drop cells for mechanisms no longer in the catalog
+    current = {m["id"] for m in mechanisms}
+    return {
+        "equipment_id": equipment["id"],
+        "fluid_id": fluid["id"],
+        "version": MATRIX_VERSION,
+        "equipment_hash": fingerprint(equipment),
+        "fluid_hash": fingerprint(fluid),
+        "mechanisms": {id: h for id, h in cells.items() if id in current},
+        "relevant": sorted(relevant & current)
+    }
+
+async def lookup_relevance(database: AsyncDatabase, equipment: Dict, fluid: Dict,
+                           mechanisms: List[Dict]) -> Tuple[List[str], List[Dict]]:
+    """
+    Read a pair's verdicts from the precomputed matrix.
+
+    Returns:
+        Tuple of (relevant IDs among up-to-date cells in catalog order,
+        mechanisms that still need live analysis)
+    """
+    row = await database.find_one(
+        RELEVANCE_MATRIX_COLLECTION,
+        {"equipment_id": equipment["id"], "fluid_id": fluid["id"]},
+        {"_id": 0}
+    )
+    return row_verdicts(row, equipment, fluid, mechanisms)
+
+def row_verdicts(row: Optional[Dict], equipment: Dict, fluid: Dict,
+                 mechanisms: List[Dict]) -> Tuple[List[str], List[Dict]]:
+    """
+    Split an already-fetched matrix row into up-to-date relevant IDs and mechanisms needing analysis.
+    """
+    missing = stale_mechanisms(row, equipment, fluid, mechanisms)
+    missing_ids = {m["id"] for m in missing}
+    relevant = set(row.get("relevant", [])) if row else set()
+    relevant_ids = [m["id"] for m in mechanisms if m["id"] in relevant and m["id"] not in missing_ids]
+    return relevant_ids, missing
+
+async def store_cells(database: AsyncDatabase, equipment: Dict, fluid: Dict, mechanisms: List[Dict],
+                      verdicts: Dict[str, bool]):
+    """
+    Merge freshly decided cells ({mechanism ID: relevant}) into a pair's matrix row.
+    """
+    collection = database.db[RELEVANCE_MATRIX_COLLECTION]
+    key = {"equipment_id": equipment["id"], "fluid_id": fluid["id"]}
+    row = await database.find_one(RELEVANCE_MATRIX_COLLECTION, key, {"_id": 0})
+    updated = merge_row(row, equipment, fluid, mechanisms, verdicts)
+    await database.run(collection.replace_one, key, updated, upsert=True)
+
+async def fetch_rows(database: AsyncDatabase, pairs: List[Tuple[Dict, Dict]]) -> Dict[Tuple[str, str], Dict]:
+    """
+    Read the matrix rows of many equipment/fluid pairs in one query.
+
+    Returns:
+        Dictionary mapping (equipment ID, fluid ID) to its row; pairs without a row are left out
+    """
+    keys = {(equipment["id"], fluid["id"]) for equipment, fluid in pairs}
+    if not keys:
+        return {}
+    query = {
+        "equipment_id": {"$in": sorted({k[0] for k in keys})},
+        "fluid_id": {"$in": sorted({k[1] for k in keys})}
+    }
+    rows = await database.find(RELEVANCE_MATRIX_COLLECTION, query, {"_id": 0})
+    # The query matches the cross product of the IDs; keep only the requested pairs
+    return {
+        (row["equipment_id"], row["fluid_id"]): row
+        for row in rows if (row["equipment_id"], row["fluid_id"]) in keys
+    }
+
+async def store_rows(database: AsyncDatabase, rows: List[Dict]):
+    """
+    Upsert merged matrix rows in a single bulk write.
+    """
+    if not rows:
+        return
+    operations = [
+        ReplaceOne({"equipment_id": row["equipment_id"], "fluid_id": row["fluid_id"]}, row, upsert=True)
+        for row in rows
+    ]
+    await database.run(database.db[RELEVANCE_MATRIX_COLLECTION].bulk_write, operations, ordered=False)
+
+async def build_relevance_matrix(database: AsyncDatabase, analyze, full: bool = False) -> Dict[str, int]:
+    """
+    Evaluate every stale equipment x fluid x mechanism cell and store the matrix.
+
+    Only cells whose equipment, fluid or mechanism changed since the last build
+    are sent for analysis, so catalog edits recompute just the affected rows and
+    columns.
+
+    Args:
+        database: Async database access layer
+        analyze: Coroutine function (equipment, fluid, mechanisms, catalog) -> {"relevant_ids": [...],
+            "verdicts": {mechanism ID: relevant}} that raises on failure
+        full: Recompute every cell regardless of hashes
+
+    Returns:
+        Dictionary with 'pairs', 'evaluated_pairs', 'evaluated_cells', 'undecided_cells'
+        (left for a later build) and 'failed_pairs'
+    """
+    collection = database.db[RELEVANCE_MATRIX_COLLECTION]
+    await database.run(collection.create_index, [("equipment_id", 1), ("fluid_id", 1)], unique=True)
+
+    equipment_list = await database.find("equipment", {}, {'_id': 0})
+    fluids = await database.find("fluids", {}, {'_id': 0})
+    mechanisms = await database.find("deterioration", {}, {'_id': 0})
+    rows = {
+        (row["equipment_id"], row["fluid_id"]): row
+        for row in await database.find(RELEVANCE_MATRIX_COLLECTION, {}, {'_id': 0})
+    }
+
+    stats = {"pairs": 0, "evaluated_pairs": 0, "evaluated_cells": 0, "undecided_cells": 0, "failed_pairs": 0}
+
+    async def evaluate(equipment, fluid):
+        row = None if full else rows.get((equipment["id"], fluid["id"]))
+        stale = stale_mechanisms(row, equipment, fluid, mechanisms)
+        if not stale:
+            return
+        try:
+            result = await analyze(equipment, fluid, stale, mechanisms)
+        except Exception as e:
+            stats["failed_pairs"] += 1
+            print(f"Error analyzing {equipment['id']} x {fluid['id']}: {str(e)}")
+            return
+        verdicts = result["verdicts"]
+        updated = merge_row(row, equipment, fluid, mechanisms, verdicts)
+        await database.run(
+            collection.replace_one,
+            {"equipment_id": equipment["id"], "fluid_id": fluid["id"]},
+            updated,
+            upsert=True
+        )
+        stats["evaluated_pairs"] += 1
+        stats["evaluated_cells"] += len(verdicts)
+        stats["undecided_cells"] += len(stale) - len(verdicts)
+        print(f"Evaluated {len(verdicts)} of {len(stale)} mechanisms for {equipment['id']} x {fluid['id']}")
+
+    pairs = [(e, f) for e in equipment_list for f in fluids]
+    stats["pairs"] = len(pairs)
+    # The LLM client bounds how many of these run at once
+    await asyncio.gather(*(evaluate(e, f) for e, f in pairs))
+
+    # Remove rows for equipment or fluids that no longer exist
+    current = {(e["id"], f["id"]) for e, f in pairs}
+    for equipment_id, fluid_id in set(rows) - current:
+        await database.run(collection.delete_one, {"equipment_id": equipment_id, "fluid_id": fluid_id})
+
+    # Cached verdicts are served in front of the matrix, so drop them once cells change
+    if stats["evaluated_cells"]:
+        await database.run(database.db[RELEVANCE_CACHE_COLLECTION].delete_many, {})
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the equipment x fluid deterioration relevance matrix")
+    parser.add_argument("--full", action="store_true", help="Recompute every cell")
+    args = parser.parse_args()
+
+    # Imported here: the API module imports this one for lookups
+    from inspection_api import analyze_relevance_cells, llm
+
+    async def run():
+        database = AsyncDatabase(create_mongo_client(MONGO_URI), DB_NAME)
+        try:
+            started = time.perf_counter()
+            stats = await build_relevance_matrix(database, analyze_relevance_cells, args.full)
+            print(f"Relevance matrix: {stats['evaluated_cells']} cells in {stats['evaluated_pairs']} of "
+                  f"{stats['pairs']} pairs evaluated, {stats['undecided_cells']} cells undecided, "
+                  f"{stats['failed_pairs']} failed, "
+                  f"in {time.perf_counter() - started:.1f}s")
+        finally:
+            database.close()
+            await llm.aclose()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import html
+import json
+import os
+import re
+import time
+import zlib
+from typing import Any, Dict, List
+
+import numpy as np
+
+from field_extraction import find_dxl_files, iter_document_records
+from precedent_index import is_empty
+from scenario_model import SCENARIO_COMMENT_ITEMS, map_scenarios
+
+# Where the CLI writes the clusters
+SCENARIO_CLUSTERS_PATH = "scenario_clusters.json"
+
+# Character shingle length over normalized text
+SHINGLE_SIZE = 4
+
+# MinHash signature length, split into LSH bands of BAND_ROWS rows; texts
+# sharing any band become candidates (about 0.4 Jaccard and up)
+NUM_PERMUTATIONS = 128
+BAND_ROWS = 4
+
+# Candidates are merged when their estimated Jaccard similarity reaches this
+SIMILARITY_THRESHOLD = float(os.getenv("SCENARIO_CLUSTER_THRESHOLD", "0.6"))
+
+# Mersenne prime modulus for the universal hash family (shingle hashes are reduced below it)
+HASH_PRIME = (1 << 31) - 1
+
+# Texts whose shingle hashes are gathered per signature batch
+SIGNATURE_BATCH_SIZE = 1024
+
+# Shingles permuted at once; bounds the (shingles x NUM_PERMUTATIONS) uint64
+# block to about 8 MB however long the texts in a batch are
+SIGNATURE_BLOCK_SHINGLES = 8192
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def normalize_text(text: str) -> str:
+    return " ".join(TOKEN_PATTERN.findall(html.unescape(text).lower()))
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """
+    Hashes of the distinct character shingles of a normalized text.
+    """
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) % HASH_PRIME for s in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+def permutation_parameters(seed: int = 1) -> tuple:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, HASH_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+    b = rng.integers(0, HASH_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+    return a, b
+
+def minhash_signatures(texts: List[str]) -> np.ndarray:
+    """
+    MinHash signatures (one row per text) under NUM_PERMUTATIONS hash functions.
+
+    The shingles of a batch are permuted in blocks of SIGNATURE_BLOCK_SHINGLES;
+    a text split across blocks takes the minimum over its parts.
+    """
+    a, b = permutation_parameters()
+    signatures = np.full((len(texts), NUM_PERMUTATIONS), HASH_PRIME, dtype=np.uint32)
+    for start in range(0, len(texts), SIGNATURE_BATCH_SIZE):
+        hashes = [shingle_hashes(text) for text in texts[start:start + SIGNATURE_BATCH_SIZE]]
+        shingles = np.concatenate(hashes)
+        rows = np.repeat(np.arange(start, start + len(hashes)), [len(h) for h in hashes])
+        for block in range(0, len(shingles), SIGNATURE_BLOCK_SHINGLES):
+            block_rows = rows[block:block + SIGNATURE_BLOCK_SHINGLES]
+            # (a * x + b) mod p stays below 2**63 because a, x < 2**31
+            permuted = (shingles[block:block + SIGNATURE_BLOCK_SHINGLES, None] * a + b) % HASH_PRIME
+            offsets = np.flatnonzero(np.r_[True, block_rows[1:] != block_rows[:-1]])
+            texts_in_block = block_rows[offsets]
+            signatures[texts_in_block] = np.minimum(signatures[texts_in_block],
+                                                    np.minimum.reduceat(permuted, offsets, axis=0))
+    return signatures
+
+def find(parents: np.ndarray, i: int) -> int:
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+def cluster_signatures(signatures: np.ndarray) -> np.ndarray:
+    """
+    Group near-duplicate signatures with LSH banding.
+
+    Each band is hashed to buckets; every bucket member is compared with the
+    bucket's first member only, so the work stays linear in the number of texts
+    and transitive links join the rest.
+
+    Returns:
+        Cluster root index for every row
+    """
+    count = len(signatures)
+    parents = np.arange(count)
+    for start in range(0, NUM_PERMUTATIONS, BAND_ROWS):
+        band = np.ascontiguousarray(signatures[:, start:start + BAND_ROWS])
+        keys = band.view(np.dtype((np.void, band.dtype.itemsize * BAND_ROWS))).ravel()
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+        for bucket in np.split(order, boundaries):
+            if len(bucket) < 2:
+                continue
+            head = bucket[0]
+            similarity = (signatures[bucket[1:]] == signatures[head]).mean(axis=1)
+            for member in bucket[1:][similarity >= SIMILARITY_THRESHOLD]:
+                root_head, root_member = find(parents, head), find(parents, member)
+                if root_head != root_member:
+                    parents[root_member] = root_head
+    return np.array([find(parents, i) for i in range(count)])
+
+def cluster_texts(counts: Dict[str, int]) -> List[Dict[str, Any]]:
+    """
+    Cluster near-duplicate texts.
+
+    Args:
+        counts: Occurrences of each distinct text
+
+    Returns:
+        Clusters, largest first, with the most frequent text as 'representative',
+        total occurrences as 'size', the distinct 'variants' and the failure
+        scenario catalog IDs the representative maps to
+    """
+    normalized = {}
+    for text, count in counts.items():
+        key = normalize_text(text)
+        if key:
+            entry = normalized.setdefault(key, {"texts": {}, "count": 0})
+            entry["texts"][text] = entry["texts"].get(text, 0) + count
+            entry["count"] += count
+    keys = list(normalized)
+    if not keys:
+        return []
+
+    roots = cluster_signatures(minhash_signatures(keys))
+    groups = {}
+    for key, root in zip(keys, roots.tolist()):
+        groups.setdefault(root, []).append(key)
+
+    clusters = []
+    for members in groups.values():
+        texts = {}
+        for key in members:
+            texts.update(normalized[key]["texts"])
+        variants = sorted(texts, key=lambda t: (-texts[t], len(t), t))
+        clusters.append({
+            "representative": variants[0],
+            "size": sum(texts.values()),
+            "variants": variants,
+            "failure_scenarios": sorted(map_scenarios([variants[0]]))
+        })
+    return sorted(clusters, key=lambda c: (-c["size"], c["representative"]))
+
+def count_scenario_texts(source: str) -> Dict[str, int]:
+    """
+    Count Field_Tx_6 scenario texts in a folder of DXL files, or in a text file with one value per line.
+    """
+    counts = {}
+    if os.path.isdir(source):
+        for file_path in find_dxl_files(source):
+            try:
+                for document in iter_document_records(file_path, ("Field_Tx_6",)):
+                    for name, value in document["items"].get("Field_Tx_6", {}).items():
+                        if name not in SCENARIO_COMMENT_ITEMS and not is_empty(value):
+                            counts[value] = counts.get(value, 0) + 1
+            except Exception as e:
+                print(f"Error processing {file_path.name}: {str(e)}")
+    else:
+        with open(source, encoding="utf-8") as f:
+            for line in f:
+                value = line.rstrip("\n")
+                if not is_empty(value):
+                    counts[value] = counts.get(value, 0) + 1
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate Field_Tx_6 failure scenarios")
+    parser.add_argument("source", help="Folder containing DXL files, or a file with one scenario per line")
+    parser.add_argument("--output", default=SCENARIO_CLUSTERS_PATH, help="Clusters file (.json)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = count_scenario_texts(args.source)
+    clusters = cluster_texts(counts)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(clusters, f, indent=2)
+    unmapped = sum(1 for c in clusters if not c["failure_scenarios"])
+    print(f"Clustered {sum(counts.values())} scenarios ({len(counts)} distinct) into {len(clusters)} clusters "
+          f"({unmapped} not matching the catalog) in {time.perf_counter() - started:.1f}s -> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+from deterioration_normalizer import get_normalizer
+from field_extraction import find_dxl_files, iter_document_records
+from precedent_index import credible_mechanisms, is_empty
+
+# Where the offline-built association model is written and loaded from
+SCENARIO_MODEL_PATH = os.getenv("SCENARIO_MODEL_PATH", "scenario_model.npz")
+
+# Item families read from each assessment
+SCENARIO_FAMILIES = ("Deterioration_Tx", "DetCredible_Tx", "Field_Tx_6")
+
+# Field_Tx_6 items holding free comments rather than failure scenarios
+SCENARIO_COMMENT_ITEMS = {"Field_Tx_6_21"}
+
+# Keywords mapping Field_Tx_6 failure-scenario text onto `failure_scenarios` IDs
+SCENARIO_KEYWORDS = [
+    ("corrosion-failure", [r"corro", r"pitting", r"\bcui\b", r"thinning", r"wall loss", r"galvanic"]),
+    ("fatigue-failure", [r"fatigue", r"cyclic", r"vibration"]),
+    ("erosion-failure", [r"erosion", r"eroded", r"cavitation", r"\bwear"]),
+    ("structural-collapse", [r"support", r"collapse", r"skirt", r"structural", r"foundation", r"movement of"]),
+    ("gradual-leakage", [r"\bleak", r"weep", r"seep"]),
+    ("catastrophic", [r"rupture", r"catastrophic", r"burst", r"explosion", r"brittle fracture"]),
+    ("environmental-release", [r"release", r"spill", r"to atmosphere", r"environment", r"loss of containment"]),
+    ("functional-failure", [r"loss of (?:function|performance|efficiency)", r"blockage", r"fouling", r"failure to operate"]),
+    ("process-upset", [r"contamination", r"ingress", r"into the (?:shell|tube)", r"process upset", r"overpressur"]),
+    ("safety-activation", [r"relief valve", r"\bpsv\b", r"\bprv\b", r"\btrip", r"\besd\b"]),
+]
+
+# Evidence thresholds: mechanisms seen in fewer documents go to the LLM, and
+# scenarios need this many co-occurrences and this confidence to be returned
+MIN_MECHANISM_DOCUMENTS = int(os.getenv("SCENARIO_MIN_MECHANISM_DOCUMENTS", "3"))
+MIN_PAIR_COUNT = int(os.getenv("SCENARIO_MIN_PAIR_COUNT", "2"))
+MIN_CONFIDENCE = float(os.getenv("SCENARIO_MIN_CONFIDENCE", "0.3"))
+
+def compile_keywords(table):
+    return [(id, re.compile("|".join(patterns), re.IGNORECASE)) for id, patterns in table]
+
+SCENARIO_PATTERNS = compile_keywords(SCENARIO_KEYWORDS)
+
+def map_mechanisms(names: Iterable[str]) -> Set[str]:
+    """
+    Map historical mechanism names onto deterioration catalog IDs.
+    """
+    return {id for resolution in get_normalizer().resolve_many(names) for id in resolution.ids}
+
+def map_scenarios(texts: Iterable[str]) -> Set[str]:
+    """
+    Map historical failure-scenario text onto failure_scenarios catalog IDs.
+    """
+    return {id for text in texts for id, pattern in SCENARIO_PATTERNS if pattern.search(text)}
+
+def assessment_pairs(items: Dict[str, Dict[str, str]]) -> Tuple[Set[str], Set[str]]:
+    """
+    Catalog IDs of the credible mechanisms and the failure scenarios of one assessment.
+    """
+    scenarios = [
+        value for name, value in items.get("Field_Tx_6", {}).items()
+        if name not in SCENARIO_COMMENT_ITEMS and not is_empty(value)
+    ]
+    return map_mechanisms(credible_mechanisms(items)), map_scenarios(scenarios)
+
+class ScenarioModel:
+    """
+    Deterioration -> failure-scenario association counts from past assessments.
+
+    Co-occurrences are stored as a sparse COO matrix (mechanism index, scenario
+    index, document count). Confidence is P(scenario | mechanism); a set of
+    mechanisms is scored with a noisy-OR of their confidences.
+    """
+
+    def __init__(self, mechanism_ids: List[str], scenario_ids: List[str], rows: np.ndarray, cols: np.ndarray,
+                 counts: np.ndarray, mechanism_counts: np.ndarray, scenario_counts: np.ndarray, documents: int):
+        self.mechanism_ids = mechanism_ids
+        self.scenario_ids = scenario_ids
+        self.rows = rows
+        self.cols = cols
+        self.counts = counts
+        self.mechanism_counts = mechanism_counts
+        self.scenario_counts = scenario_counts
+        self.documents = documents
+        # Per-mechanism {scenario ID: (pair count, confidence)} for constant-time lookups
+        self.associations: Dict[str, Dict[str, Tuple[int, float]]] = {}
+        for row, col, count in zip(rows.tolist(), cols.tolist(), counts.tolist()):
+            mechanism = mechanism_ids[row]
+            self.associations.setdefault(mechanism, {})[scenario_ids[col]] = (
+                count, count / int(mechanism_counts[row])
+            )
+        self.mechanism_documents = dict(zip(mechanism_ids, mechanism_counts.tolist()))
+        self.scenario_documents = dict(zip(scenario_ids, scenario_counts.tolist()))
+
+    @classmethod
+    def build(cls, assessments: Iterable[Tuple[Set[str], Set[str]]]) -> "ScenarioModel":
+        """
+        Count co-occurrences over (mechanism IDs, scenario IDs) pairs, one per assessment.
+        """
+        pairs, mechanism_totals, scenario_totals, documents = {}, {}, {}, 0
+        for mechanisms, scenarios in assessments:
+            if not mechanisms or not scenarios:
+                continue
+            documents += 1
+            for m in mechanisms:
+                mechanism_totals[m] = mechanism_totals.get(m, 0) + 1
+                for s in scenarios:
+                    pairs[(m, s)] = pairs.get((m, s), 0) + 1
+            for s in scenarios:
+                scenario_totals[s] = scenario_totals.get(s, 0) + 1
+
+        mechanism_ids = sorted(mechanism_totals)
+        scenario_ids = sorted(scenario_totals)
+        m_index = {id: i for i, id in enumerate(mechanism_ids)}
+        s_index = {id: i for i, id in enumerate(scenario_ids)}
+        keys = sorted(pairs)
+        return cls(
+            mechanism_ids, scenario_ids,
+            np.array([m_index[m] for m, _ in keys], dtype=np.int32),
+            np.array([s_index[s] for _, s in keys], dtype=np.int32),
+            np.array([pairs[k] for k in keys], dtype=np.int32),
+            np.array([mechanism_totals[m] for m in mechanism_ids], dtype=np.int32),
+            np.array([scenario_totals[s] for s in scenario_ids], dtype=np.int32),
+            documents
+        )
+
+    def save(self, path: str = SCENARIO_MODEL_PATH):
+        metadata = json.dumps({
+            "mechanism_ids": self.mechanism_ids,
+            "scenario_ids": self.scenario_ids,
+            "documents": self.documents
+        }).encode("utf-8")
+        np.savez(path, rows=self.rows, cols=self.cols, counts=self.counts,
+                 mechanism_counts=self.mechanism_counts, scenario_counts=self.scenario_counts,
+                 metadata=np.frombuffer(metadata, dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path: str = SCENARIO_MODEL_PATH) -> "ScenarioModel":
+        with np.load(path) as arrays:
+            metadata = json.loads(arrays["metadata"].tobytes())
+            return cls(metadata["mechanism_ids"], metadata["scenario_ids"], arrays["rows"], arrays["cols"],
+                       arrays["counts"], arrays["mechanism_counts"], arrays["scenario_counts"],
+                       metadata["documents"])
+
+    def unseen(self, mechanism_ids: Iterable[str]) -> List[str]:
+        """
+        Mechanisms with too little history to be answered from the model.
+        """
+        return [id for id in mechanism_ids if self.mechanism_documents.get(id, 0) < MIN_MECHANISM_DOCUMENTS]
+
+    def rank(self, mechanism_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Rank failure scenarios for a set of mechanisms.
+
+        Returns:
+            Dictionaries with 'id', 'confidence' (noisy-OR over the mechanisms),
+            'support' (co-occurring documents) and 'lift' of the strongest
+            mechanism, best first, above the evidence thresholds
+        """
+        scores = {}
+        for mechanism in set(mechanism_ids):
+            for scenario, (count, confidence) in self.associations.get(mechanism, {}).items():
+                if count < MIN_PAIR_COUNT:
+                    continue
+                miss, support, best = scores.get(scenario, (1.0, 0, 0.0))
+                scores[scenario] = (miss * (1 - confidence), support + count, max(best, confidence))
+
+        ranked = []
+        for scenario, (miss, support, best) in scores.items():
+            confidence = 1 - miss
+            if confidence < MIN_CONFIDENCE:
+                continue
+            base_rate = self.scenario_documents[scenario] / self.documents
+            ranked.append({
+                "id": scenario,
+                "confidence": round(confidence, 4),
+                "support": support,
+                "lift": round(best / base_rate, 3)
+            })
+        return sorted(ranked, key=lambda r: (-r["confidence"], r["id"]))
+
+def iter_assessment_pairs(folder_path: str):
+    """
+    Yield (mechanism IDs, scenario IDs) for every assessment document under a folder.
+    """
+    for file_path in find_dxl_files(folder_path):
+        try:
+            for document in iter_document_records(file_path, SCENARIO_FAMILIES):
+                yield assessment_pairs(document["items"])
+        except Exception as e:
+            print(f"Error processing {file_path.name}: {str(e)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the deterioration -> failure scenario association model")
+    parser.add_argument("folder", help="Folder containing DXL files")
+    parser.add_argument("--output", default=SCENARIO_MODEL_PATH, help="Model file (.npz)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    model = ScenarioModel.build(iter_assessment_pairs(args.folder))
+    model.save(args.output)
+    print(f"Scenario model: {model.documents} assessments, {len(model.mechanism_ids)} mechanisms, "
+          f"{len(model.scenario_ids)} scenarios, {len(model.counts)} non-zero pairs "
+          f"in {time.perf_counter() - started:.1f}s -> {args.output}")
+
+if __name__ == "__main__":
+    main()
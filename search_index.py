@@ -0,0 +1,295 @@
+import argparse
+import json
+import math
+import os
+import re
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from field_extraction import document_key, find_dxl_files, iter_document_records
+
+# Where the index snapshot is written and loaded from
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "search_index.npz")
+
+# Item families whose text is searchable
+SEARCH_FAMILIES = ("Field_Tx_6", "Deterioration_Tx", "DetComment_Tx", "Field_Tx_1")
+
+# Field_Tx_1 items used, in order of preference, as a result's title
+TITLE_ITEMS = ("Field_Tx_1_6", "Field_Tx_1_12")
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Compact postings on save once this share of indexed documents has been replaced or removed
+COMPACT_DELETED_FRACTION = 0.25
+
+# Lowercase word tokens; common words are not indexed
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were where which with"
+    .split()
+)
+
+# Largest term frequency a posting can hold
+MAX_TERM_FREQUENCY = 0xFFFF
+
+def normalize_token(token: str) -> str:
+    """
+    Fold simple plurals so 'cracks' matches 'crack'.
+    """
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    return [normalize_token(t) for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+def document_text(items: Dict[str, Dict[str, str]]) -> str:
+    return "\n".join(
+        value for family in SEARCH_FAMILIES for value in items.get(family, {}).values()
+        if value and value.strip() not in ("-", "")
+    )
+
+def document_title(key: str, items: Dict[str, Dict[str, str]]) -> str:
+    fields = items.get("Field_Tx_1", {})
+    for name in TITLE_ITEMS:
+        if fields.get(name, "").strip() not in ("", "-"):
+            return fields[name]
+    return key
+
+class SearchIndex:
+    """
+    In-memory inverted index with BM25 ranking.
+
+    Each term's postings are two arrays: document-ID gaps (delta-encoded, so
+    appending a newer document is O(1)) and term frequencies. Documents are
+    keyed by note UNID; re-indexing a revised note tombstones its old entry and
+    appends a new one, and save() compacts the postings once enough entries
+    are dead. Document frequencies used for IDF include dead entries until then.
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.gaps: List[array] = []
+        self.frequencies: List[array] = []
+        self.last_doc = array("q")
+        self.doc_lengths = array("I")
+        self.live = bytearray()
+        self.docs: List[Dict[str, Any]] = []
+        self.by_key: Dict[str, int] = {}
+        self.total_length = 0
+        self.live_count = 0
+
+    def add_document(self, key: str, text: str, title: str = None, sequence: Optional[str] = None,
+                     source: Optional[str] = None) -> bool:
+        """
+        Index a document, replacing any earlier version with the same key.
+
+        Args:
+            key: Note UNID (or document key for notes without one)
+            text: Searchable text
+            title: Title shown in results
+            sequence: Note sequence number; an unchanged sequence is not re-indexed
+            source: DXL file (or file#UNID) the document came from
+
+        Returns:
+            Whether the index changed
+        """
+        previous = self.by_key.get(key)
+        if previous is not None:
+            if sequence is not None and self.docs[previous].get("sequence") == sequence:
+                return False
+            self.remove_document(key)
+
+        doc_id = len(self.docs)
+        counts = {}
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            term = self.vocabulary.get(token)
+            if term is None:
+                term = self.vocabulary[token] = len(self.gaps)
+                self.gaps.append(array("I"))
+                self.frequencies.append(array("H"))
+                self.last_doc.append(-1)
+            gap = doc_id - self.last_doc[term] if self.last_doc[term] >= 0 else doc_id
+            self.gaps[term].append(gap)
+            self.frequencies[term].append(min(count, MAX_TERM_FREQUENCY))
+            self.last_doc[term] = doc_id
+
+        length = sum(counts.values())
+        self.docs.append({"key": key, "title": title or key, "source": source, "sequence": sequence})
+        self.doc_lengths.append(length)
+        self.live.append(1)
+        self.by_key[key] = doc_id
+        self.total_length += length
+        self.live_count += 1
+        return True
+
+    def remove_document(self, key: str) -> bool:
+        doc_id = self.by_key.pop(key, None)
+        if doc_id is None:
+            return False
+        self.live[doc_id] = 0
+        self.total_length -= self.doc_lengths[doc_id]
+        self.live_count -= 1
+        return True
+
+    def add_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Index extracted DXL document records (as produced by field_extraction).
+
+        Returns:
+            Number of documents added or replaced
+        """
+        changed = 0
+        for record in records:
+            source = record.get("key") or record.get("file")
+            key = record.get("unid") or source
+            text = document_text(record["items"])
+            if self.add_document(key, text, document_title(key, record["items"]), record.get("sequence"), source):
+                changed += 1
+        return changed
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Return the k live documents with the highest BM25 score for a query.
+        """
+        terms = [self.vocabulary[t] for t in dict.fromkeys(tokenize(query)) if t in self.vocabulary]
+        if not terms or not self.live_count or k < 1:
+            return []
+
+        doc_count = len(self.docs)
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        average = self.total_length / self.live_count or 1.0
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average)
+
+        scores = np.zeros(doc_count, dtype=np.float32)
+        for term in terms:
+            doc_ids = np.cumsum(np.frombuffer(self.gaps[term], dtype=np.uint32), dtype=np.int64)
+            tf = np.frombuffer(self.frequencies[term], dtype=np.uint16).astype(np.float32)
+            df = len(doc_ids)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            scores[doc_ids] += idf * tf * (BM25_K1 + 1) / (tf + norms[doc_ids])
+        scores *= np.frombuffer(self.live, dtype=np.uint8)
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [
+            {"key": self.docs[i]["key"], "source": self.docs[i]["source"], "title": self.docs[i]["title"],
+             "score": round(float(scores[i]), 4)}
+            for i in candidates
+        ]
+
+    def compact(self):
+        """
+        Drop dead documents from the postings and renumber the live ones.
+        """
+        live = np.frombuffer(self.live, dtype=np.uint8).astype(bool)
+        new_ids = np.cumsum(live) - 1
+        vocabulary, gaps, frequencies, last_doc = {}, [], [], array("q")
+        for token, term in self.vocabulary.items():
+            doc_ids = np.cumsum(np.frombuffer(self.gaps[term], dtype=np.uint32), dtype=np.int64)
+            keep = live[doc_ids]
+            if not keep.any():
+                continue
+            remapped = new_ids[doc_ids[keep]]
+            vocabulary[token] = len(gaps)
+            gaps.append(array("I", np.diff(remapped, prepend=0).astype(np.uint32).tobytes()))
+            frequencies.append(array("H", np.frombuffer(self.frequencies[term], dtype=np.uint16)[keep].tobytes()))
+            last_doc.append(int(remapped[-1]))
+
+        self.vocabulary, self.gaps, self.frequencies, self.last_doc = vocabulary, gaps, frequencies, last_doc
+        self.docs = [doc for doc, alive in zip(self.docs, self.live) if alive]
+        self.doc_lengths = array("I", np.frombuffer(self.doc_lengths, dtype=np.uint32)[live].tobytes())
+        self.live = bytearray(b"\x01" * len(self.docs))
+        self.by_key = {doc["key"]: i for i, doc in enumerate(self.docs)}
+
+    def save(self, path: str = SEARCH_INDEX_PATH):
+        """
+        Write a snapshot atomically, compacting first if many entries are dead.
+        """
+        if self.docs and 1 - self.live_count / len(self.docs) >= COMPACT_DELETED_FRACTION:
+            self.compact()
+        offsets = np.zeros(len(self.gaps) + 1, dtype=np.int64)
+        np.cumsum([len(g) for g in self.gaps], out=offsets[1:])
+        metadata = json.dumps({"vocabulary": list(self.vocabulary), "docs": self.docs}).encode("utf-8")
+        temp_path = f"{path}.tmp.npz"
+        np.savez(
+            temp_path,
+            gaps=np.frombuffer(b"".join(g.tobytes() for g in self.gaps), dtype=np.uint32),
+            frequencies=np.frombuffer(b"".join(f.tobytes() for f in self.frequencies), dtype=np.uint16),
+            offsets=offsets,
+            last_doc=np.frombuffer(self.last_doc, dtype=np.int64),
+            doc_lengths=np.frombuffer(self.doc_lengths, dtype=np.uint32),
+            live=np.frombuffer(bytes(self.live), dtype=np.uint8),
+            metadata=np.frombuffer(metadata, dtype=np.uint8)
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str = SEARCH_INDEX_PATH) -> "SearchIndex":
+        index = cls()
+        with np.load(path) as snapshot:
+            metadata = json.loads(snapshot["metadata"].tobytes())
+            gaps, frequencies = snapshot["gaps"].tobytes(), snapshot["frequencies"].tobytes()
+            offsets = snapshot["offsets"]
+            index.last_doc = array("q", snapshot["last_doc"].tobytes())
+            index.doc_lengths = array("I", snapshot["doc_lengths"].tobytes())
+            index.live = bytearray(snapshot["live"].tobytes())
+        index.vocabulary = {token: term for term, token in enumerate(metadata["vocabulary"])}
+        index.gaps = [array("I", gaps[4 * start:4 * end]) for start, end in zip(offsets[:-1], offsets[1:])]
+        index.frequencies = [array("H", frequencies[2 * start:2 * end]) for start, end in zip(offsets[:-1], offsets[1:])]
+        index.docs = metadata["docs"]
+        index.by_key = {doc["key"]: i for i, doc in enumerate(index.docs) if index.live[i]}
+        index.live_count = len(index.by_key)
+        index.total_length = int(np.frombuffer(index.doc_lengths, dtype=np.uint32)[
+            np.frombuffer(index.live, dtype=np.uint8).astype(bool)].sum())
+        return index
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "documents": self.live_count,
+            "dead_documents": len(self.docs) - self.live_count,
+            "terms": len(self.vocabulary),
+            "postings": sum(len(g) for g in self.gaps)
+        }
+
+def iter_search_records(folder_path: str):
+    """
+    Yield extracted records, tagged with their document key, for every DXL document under a folder.
+    """
+    for file_path in find_dxl_files(folder_path):
+        try:
+            documents = list(iter_document_records(file_path, SEARCH_FAMILIES))
+        except Exception as e:
+            print(f"Error processing {file_path.name}: {str(e)}")
+            continue
+        for document in documents:
+            document["key"] = document_key(file_path, document, len(documents))
+            yield document
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the BM25 search index from DXL files")
+    parser.add_argument("folder", help="Folder containing DXL files")
+    parser.add_argument("--output", default=SEARCH_INDEX_PATH, help="Snapshot file (.npz)")
+    parser.add_argument("--update", action="store_true",
+                        help="Apply new and revised documents to the existing snapshot")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = SearchIndex.load(args.output) if args.update and os.path.exists(args.output) else SearchIndex()
+    changed = index.add_records(iter_search_records(args.folder))
+    index.save(args.output)
+    stats = index.stats()
+    print(f"Search index: {changed} documents indexed, {stats['documents']} total, {stats['terms']} terms, "
+          f"{stats['postings']} postings in {time.perf_counter() - started:.1f}s -> {args.output}")
+
+if __name__ == "__main__":
+    main()
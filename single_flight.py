@@ -0,0 +1,65 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical computations into one in-flight task.
+
+    The first caller for a key starts the computation; callers arriving while it
+    runs wait on the same task and receive its result or exception. The task is
+    cancelled only when every waiter has gone away, so one disconnecting client
+    does not abort the work others are waiting for.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+        self.waiters: Dict[Hashable, int] = {}
+        self.started = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the result of func(), sharing it with concurrent calls for the same key.
+
+        Args:
+            key: Identity of the computation
+            func: Zero-argument coroutine function to run if nothing is in flight
+
+        Returns:
+            Result of the shared computation
+        """
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self.calls[key] = task
+            self.waiters[key] = 0
+            self.started += 1
+            task.add_done_callback(lambda done: self.finish(key, done))
+        else:
+            self.collapsed += 1
+
+        self.waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self.calls.get(key) is task and self.waiters[key] == 1:
+                task.cancel()
+            raise
+        finally:
+            if self.calls.get(key) is task:
+                self.waiters[key] -= 1
+
+    def finish(self, key: Hashable, task: asyncio.Future):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+            del self.waiters[key]
+        # Mark the exception as retrieved; waiters re-raise it themselves
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "started": self.started,
+            "collapsed": self.collapsed,
+            "in_flight": len(self.calls)
+        }
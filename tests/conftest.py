@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Folder of single-document DXL exports shipped with the repo
+SAMPLE_FOLDER = ROOT / "RBI_sample"
+
+@pytest.fixture(scope="session")
+def sample_folder():
+    return SAMPLE_FOLDER
+
+@pytest.fixture
+def multi_document_folder(tmp_path):
+    """
+    Folder with one export holding every sample document, so parsers have to
+    find document boundaries inside a file and across chunks.
+    """
+    documents = []
+    for file_path in sorted(SAMPLE_FOLDER.glob("*.dxl")):
+        text = file_path.read_text(encoding="utf-8")
+        documents.append(text[text.index("<document"):].strip())
+    folder = tmp_path / "export"
+    folder.mkdir()
+    (folder / "export.dxl").write_text(
+        "<?xml version='1.0' encoding='utf-8'?>\n<database>\n" + "\n".join(documents) + "\n</database>\n",
+        encoding="utf-8"
+    )
+    return folder
@@ -0,0 +1,44 @@
+import math
+
+from credibility_matrix import document_equipment_type, normalize_equipment_type
+from dxl_model import DxlCorpus, parse_dxl_document
+
+DOCUMENT = """<document form='fProjectItem'>
+<noteinfo noteid='1' unid='ABC' sequence='4'/>
+<item name='Empty'/>
+<item name='Field_Tx_1_7'><text>Drums - Pots</text></item>
+<item name='Blank'><text/></item>
+<item name='Tags'><textlist><text>a</text><text/><text>c</text></textlist></item>
+<item name='Count' summary='true'><number>3</number></item>
+<item name='Broken'><number>n/a</number></item>
+</document>"""
+
+def test_self_closing_item_does_not_swallow_the_next_item():
+    document = parse_dxl_document(DOCUMENT)
+    assert "Empty" not in document.texts
+    assert document.texts["Field_Tx_1_7"] == "Drums - Pots"
+
+def test_typed_items():
+    document = parse_dxl_document(DOCUMENT)
+    assert (document.unid, document.sequence, document.form) == ("ABC", 4, "fProjectItem")
+    assert document.texts["Blank"] == ""
+    assert document.textlists["Tags"] == ("a", "", "c")
+    assert document.number("Count") == 3.0
+    assert math.isnan(document.number("Broken"))
+    assert document.number("Missing", 0) == 0
+
+def test_corpus_loads_sample(sample_folder):
+    corpus = DxlCorpus.from_folder(sample_folder)
+    assert len(corpus.documents) == 100
+    assert all(document.unid for document in corpus.documents)
+
+def test_equipment_type_variants_normalize_together():
+    assert {normalize_equipment_type(v) for v in ("Drum - Pot", "Drums - Pots", "Drum / Pot")} == {"drum pot"}
+    assert normalize_equipment_type("Heat Exchangers") == "heat exchanger"
+    assert normalize_equipment_type("Yes") == ""
+
+def test_equipment_type_falls_back_per_form():
+    document = parse_dxl_document(DOCUMENT)
+    assert document_equipment_type(document, {"Field_Tx_1_7": "Drum - Pot"}) == "drum pot"
+    document.form = "fOtherForm"
+    assert document_equipment_type(document, {"Field_Tx_1_7": "Yes", "Field_Tx_1_8": "Vessels"}) == "vessel"
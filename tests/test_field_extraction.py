@@ -0,0 +1,86 @@
+import os
+import re
+import shutil
+
+import pytest
+
+import field_extraction
+from field_extraction import (
+    find_dxl_files, iter_document_records, iter_document_records_mmap, process_dxl_folder,
+    process_dxl_folder_incremental, process_dxl_folder_parallel
+)
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_sample_folder_matches_across_parsers(sample_folder, use_mmap):
+    baseline = process_dxl_folder(sample_folder)
+    assert any(baseline.values())
+    assert process_dxl_folder(sample_folder, use_mmap=use_mmap) == baseline
+    assert process_dxl_folder_parallel(sample_folder, workers=2, use_mmap=use_mmap) == baseline
+
+@pytest.mark.parametrize("chunk_size", [257, 4096, 1 << 20])
+def test_chunked_records_match_mmap(multi_document_folder, chunk_size):
+    file_path = find_dxl_files(multi_document_folder)[0]
+    records = list(iter_document_records_mmap(file_path))
+    assert len(records) == 100
+    assert list(iter_document_records(file_path, chunk_size=chunk_size)) == records
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_parallel_byte_ranges_match_baseline(multi_document_folder, use_mmap):
+    baseline = process_dxl_folder(multi_document_folder)
+    # Small ranges split the export at many document boundaries
+    results = process_dxl_folder_parallel(multi_document_folder, workers=2, range_size=200_000, use_mmap=use_mmap)
+    assert results == baseline
+
+@pytest.fixture
+def working_folder(sample_folder, tmp_path):
+    folder = tmp_path / "dxl"
+    folder.mkdir()
+    for file_path in find_dxl_files(sample_folder)[:5]:
+        shutil.copy2(file_path, folder / file_path.name)
+    return folder
+
+def run_incremental(folder, tmp_path):
+    return process_dxl_folder_incremental(folder, manifest_path=str(tmp_path / "manifest.sqlite"))
+
+def test_incremental_matches_baseline_on_rerun(working_folder, tmp_path):
+    baseline = process_dxl_folder(working_folder)
+    assert run_incremental(working_folder, tmp_path) == baseline
+    assert run_incremental(working_folder, tmp_path) == baseline
+
+def test_incremental_picks_up_changed_file(working_folder, tmp_path):
+    run_incremental(working_folder, tmp_path)
+    file_path = find_dxl_files(working_folder)[0]
+    text = file_path.read_text(encoding="utf-8")
+    text = re.sub(r"(<item name='Field_Tx_6_\d+'>\s*<text>)", r"\1Revised ", text, count=1)
+    file_path.write_text(text.replace("sequence='", "sequence='9", 1), encoding="utf-8")
+    stat = file_path.stat()
+    os.utime(file_path, (stat.st_atime, stat.st_mtime + 10))
+
+    results = run_incremental(working_folder, tmp_path)
+    assert results == process_dxl_folder(working_folder)
+    assert any("Revised " in text for items in results.values()
+               for file_items in items.values() for text in file_items.values())
+
+def test_incremental_drops_deleted_file(working_folder, tmp_path):
+    run_incremental(working_folder, tmp_path)
+    removed = find_dxl_files(working_folder)[0]
+    removed.unlink()
+
+    results = run_incremental(working_folder, tmp_path)
+    assert results == process_dxl_folder(working_folder)
+    assert all(removed.name not in items for items in results.values())
+
+def test_incremental_keeps_unreadable_file(working_folder, tmp_path, monkeypatch):
+    baseline = run_incremental(working_folder, tmp_path)
+    unreadable = find_dxl_files(working_folder)[0]
+    stat = unreadable.stat()
+    os.utime(unreadable, (stat.st_atime, stat.st_mtime + 10))
+
+    read_documents = field_extraction.iter_dxl_documents
+    def failing_read(file_path, *args, **kwargs):
+        if file_path == unreadable:
+            raise OSError("Permission denied")
+        return read_documents(file_path, *args, **kwargs)
+    monkeypatch.setattr(field_extraction, "iter_dxl_documents", failing_read)
+
+    assert run_incremental(working_folder, tmp_path) == baseline
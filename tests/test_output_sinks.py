@@ -0,0 +1,41 @@
+import sqlite3
+
+from ingest_dxl import collapse_by_unid
+from output_sinks import SqliteSink
+
+def record(unid, text):
+    return {"unid": unid, "items": {"Field_Tx_6": {"Field_Tx_6_1": text, "Field_Tx_6_2": text + " too"}}}
+
+def stored_rows(path):
+    with sqlite3.connect(path) as connection:
+        return connection.execute(
+            "SELECT unid, file, item_index, text FROM dxl_items ORDER BY unid, item_index").fetchall()
+
+def test_sqlite_sink_keeps_last_copy_of_a_unid_within_a_batch(tmp_path):
+    path = tmp_path / "items.sqlite"
+    with SqliteSink(str(path)) as sink:
+        sink.write_document("a.dxl", record("U1", "first"))
+        sink.write_document("b.dxl", record("U1", "second"))
+        sink.write_document("a.dxl", record("U2", "other"))
+    assert stored_rows(path) == [
+        ("U1", "b.dxl", "1", "second"), ("U1", "b.dxl", "2", "second too"),
+        ("U2", "a.dxl", "1", "other"), ("U2", "a.dxl", "2", "other too"),
+    ]
+
+def test_sqlite_sink_replaces_a_unid_across_batches(tmp_path):
+    path = tmp_path / "items.sqlite"
+    with SqliteSink(str(path), batch_size=1) as sink:
+        sink.write_document("a.dxl", record("U1", "first"))
+        sink.write_document("a.dxl", {"unid": "U1", "items": {"Field_Tx_6": {"Field_Tx_6_1": "revised"}}})
+    assert stored_rows(path) == [("U1", "a.dxl", "1", "revised")]
+
+def test_sqlite_sink_skips_documents_without_unid(tmp_path):
+    path = tmp_path / "items.sqlite"
+    with SqliteSink(str(path)) as sink:
+        sink.write_document("a.dxl", record(None, "orphan"))
+        sink.write_document("a.dxl", record("", "orphan"))
+    assert stored_rows(path) == []
+
+def test_collapse_by_unid_keeps_last_record():
+    records = [{"unid": "U1", "n": 1}, {"unid": "U2", "n": 2}, {"unid": "U1", "n": 3}]
+    assert collapse_by_unid(records) == [{"unid": "U1", "n": 3}, {"unid": "U2", "n": 2}]
@@ -0,0 +1,60 @@
+from initial_data import DETERIORATION_DATA, EQUIPMENT_DATA, FLUIDS_DATA
+from prefilter_rules import prefilter_mechanisms
+from prompts import parse_verdicts
+from relevance_matrix import MATRIX_VERSION, merge_row, row_verdicts, stale_mechanisms
+
+CODES = {"M1": "mech-a", "M2": "mech-b", "M3": "mech-c"}
+
+def test_parse_verdicts_reads_code_lines():
+    text = "M1 T\n- m2: false\n**M3** True\n"
+    assert parse_verdicts(text, CODES) == {"mech-a": True, "mech-b": False, "mech-c": True}
+
+def test_parse_verdicts_ignores_unknown_codes_and_prose():
+    text = "Here are my answers.\nM9 T\nM1 F because of the fluid\nM2 maybe\n"
+    assert parse_verdicts(text, CODES) == {"mech-a": False}
+
+def test_parse_verdicts_leaves_truncated_answers_missing():
+    assert parse_verdicts("M1 T\nM2", CODES) == {"mech-a": True}
+    assert parse_verdicts(None, CODES) == {}
+
+def test_merge_row_stores_only_answered_cells():
+    equipment, fluid, mechanisms = EQUIPMENT_DATA[0], FLUIDS_DATA[0], DETERIORATION_DATA[:3]
+    first, second, third = (m["id"] for m in mechanisms)
+
+    row = merge_row(None, equipment, fluid, mechanisms, {first: True, second: False})
+    assert row["version"] == MATRIX_VERSION
+    assert set(row["mechanisms"]) == {first, second}
+    assert row["relevant"] == [first]
+
+    relevant, missing = row_verdicts(row, equipment, fluid, mechanisms)
+    assert relevant == [first]
+    assert [m["id"] for m in missing] == [third]
+
+    row = merge_row(row, equipment, fluid, mechanisms, {third: True})
+    relevant, missing = row_verdicts(row, equipment, fluid, mechanisms)
+    assert relevant == [first, third]
+    assert missing == []
+
+def test_merge_row_drops_mechanisms_removed_from_catalog():
+    equipment, fluid, mechanisms = EQUIPMENT_DATA[0], FLUIDS_DATA[0], DETERIORATION_DATA[:3]
+    row = merge_row(None, equipment, fluid, mechanisms, {m["id"]: True for m in mechanisms})
+    row = merge_row(row, equipment, fluid, mechanisms[:2], {})
+    assert set(row["mechanisms"]) == {m["id"] for m in mechanisms[:2]}
+    assert row["relevant"] == sorted(m["id"] for m in mechanisms[:2])
+
+def test_rows_from_another_version_or_edited_documents_are_stale():
+    equipment, fluid, mechanisms = EQUIPMENT_DATA[0], FLUIDS_DATA[0], DETERIORATION_DATA[:3]
+    row = merge_row(None, equipment, fluid, mechanisms, {m["id"]: False for m in mechanisms})
+    assert stale_mechanisms(row, equipment, fluid, mechanisms) == []
+
+    assert stale_mechanisms({**row, "version": "0/compact/0"}, equipment, fluid, mechanisms) == mechanisms
+    assert stale_mechanisms(row, {**equipment, "name": "Renamed"}, fluid, mechanisms) == mechanisms
+    edited = [mechanisms[0], {**mechanisms[1], "description": "Edited"}, mechanisms[2]]
+    assert stale_mechanisms(row, equipment, fluid, edited) == [edited[1]]
+
+def test_prefilter_only_excludes():
+    for equipment in EQUIPMENT_DATA:
+        for fluid in FLUIDS_DATA:
+            verdicts, ambiguous = prefilter_mechanisms(equipment, fluid, DETERIORATION_DATA)
+            assert not any(verdicts.values())
+            assert len(verdicts) + len(ambiguous) == len(DETERIORATION_DATA)
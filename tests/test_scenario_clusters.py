@@ -0,0 +1,21 @@
+import numpy as np
+
+import scenario_clusters
+from scenario_clusters import minhash_signatures, normalize_text
+
+TEXTS = [normalize_text(text) for text in (
+    "External corrosion of the shell under insulation",
+    "External corrosion of shell under the insulation",
+    "Fatigue cracking at the nozzle weld",
+    "a",
+    "Pitting " * 500,
+)]
+
+def test_signatures_do_not_depend_on_block_size(monkeypatch):
+    signatures = minhash_signatures(TEXTS)
+    monkeypatch.setattr(scenario_clusters, "SIGNATURE_BLOCK_SHINGLES", 7)
+    assert np.array_equal(minhash_signatures(TEXTS), signatures)
+
+def test_similar_texts_share_most_of_their_signature():
+    signatures = minhash_signatures(TEXTS)
+    assert (signatures[0] == signatures[1]).mean() > (signatures[0] == signatures[2]).mean()
@@ -0,0 +1,37 @@
+import pytest
+
+from field_extraction import find_dxl_files, iter_document_records
+from precedent_index import PrecedentIndex, iter_precedent_records
+from search_index import SEARCH_FAMILIES, SearchIndex
+
+@pytest.fixture(scope="module")
+def precedent_index(sample_folder):
+    return PrecedentIndex.build(list(iter_precedent_records(sample_folder)))
+
+@pytest.fixture(scope="module")
+def search_index(sample_folder):
+    index = SearchIndex()
+    index.add_records(
+        dict(record, file=file_path.name)
+        for file_path in find_dxl_files(sample_folder)
+        for record in iter_document_records(file_path, SEARCH_FAMILIES)
+    )
+    return index
+
+@pytest.mark.parametrize("k", [-3, 0])
+def test_precedent_search_returns_nothing_for_k_below_one(precedent_index, k):
+    assert precedent_index.search("horizontal drum carbon steel natural gas", k) == []
+
+def test_precedent_search_returns_at_most_k(precedent_index):
+    assert len(precedent_index.search("horizontal drum carbon steel natural gas", 1)) == 1
+    assert len(precedent_index.search("horizontal drum carbon steel natural gas", 5)) == 5
+    assert len(precedent_index.search("horizontal drum carbon steel natural gas", 10_000)) <= len(precedent_index.records)
+
+@pytest.mark.parametrize("k", [-3, 0])
+def test_search_returns_nothing_for_k_below_one(search_index, k):
+    assert search_index.search("corrosion", k) == []
+
+def test_search_returns_at_most_k(search_index):
+    assert len(search_index.search("corrosion", 1)) == 1
+    assert len(search_index.search("corrosion", 5)) == 5
+    assert len(search_index.search("corrosion", 10_000)) <= search_index.live_count